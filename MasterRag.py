@@ -1,13 +1,22 @@
-"""Search utilities for RAG pipelines: read and search PDF/CSV files."""
+"""Search utilities for RAG pipelines: read and search PDF/CSV files.
+
+PDF and text searches go through the persistent full-text index in
+fulltext_index.py, refreshed once per instance.
+"""
 
 import os
 import logging
 from pypdf import PdfReader
-import csv
-import requests
-import time
 import json
-from typing import List, Dict, Any
+import sqlite3
+import threading
+from typing import List, Dict, Any, Callable, Optional
+from csv_table import CsvTable, IndexSpec
+from clinvar_cache import cached_clinvar, get_clinvar_cache
+from document_cache import DocumentCache, shared_document_cache
+from eutils import get_eutils_client
+from hgvs_normalize import clinvar_term, variant_key
+from fulltext_index import DEFAULT_INDEX_PATH, FullTextIndex
 
 # Configure logging
 logging.basicConfig(
@@ -21,64 +30,109 @@ class MasterRAG:
     Utility class providing basic search functions over PDF and CSV documents.
     """
 
-    def __init__(self, data_folder: str = "data/raw/"):
+    def __init__(self, data_folder: str = "data/raw/", text_folder: Optional[str] = None,
+                 index_path: str = DEFAULT_INDEX_PATH, cache: Optional[DocumentCache] = None,
+                 csv_indexes: Optional[Dict[str, IndexSpec]] = None):
         """
         Initialize with a data folder containing data files.
 
         Args:
             data_folder: Path to the folder with data files.
+            text_folder: Folder of extracted .txt files to index as well
+                (default: the 'text' sibling of data_folder).
+            index_path: SQLite file holding the full-text index.
+            cache: Cache for parsed documents (default: the process-wide
+                cache shared by all instances). ClinVar results go to the
+                persistent cache in clinvar_cache.py.
+            csv_indexes: CSV file name -> {column: 'exact' | 'ngram' | both}
+                indexes to build when the file is loaded.
         """
         self.data_folder = data_folder
-        self.document_cache: Dict[str, Any] = {}
-        # Cache for ClinVar API results
-        self.clinvar_cache: Dict[str, Any] = {}
+        self.text_folder = text_folder or os.path.join(os.path.dirname(os.path.normpath(data_folder)), "text")
+        self.index_path = index_path
+        self._fulltext: Optional[FullTextIndex] = None
+        self._fulltext_lock = threading.Lock()
+        # Parsed PDFs and CSVs
+        self.document_cache = cache if cache is not None else shared_document_cache()
+        self.csv_indexes = dict(csv_indexes or {})
 
-    def read_pdf(self, filename: str) -> str:
-        """Read and return text content from a PDF file."""
-        if filename in self.document_cache:
-            return self.document_cache[filename]
+    def _read_cached(self, kind: str, filename: str, loader: Callable[[str], Any],
+                     variant: Any = None) -> Any:
+        """
+        Load a data file through the document cache.
 
+        Keys include the file's mtime, so an edited file is re-read and its
+        stale entry ages out of the LRU; variant distinguishes differently
+        loaded copies of the same file.
+        """
         file_path = os.path.join(self.data_folder, filename)
-        if not os.path.exists(file_path):
+        try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError:
             logger.warning(f"File not found: {file_path}")
-            return ""
-
+            return None
+        key = (kind, os.path.abspath(file_path), mtime_ns, variant)
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n\n"
-            self.document_cache[filename] = text
-            return text
+            return self.document_cache.get_or_load(key, lambda: loader(file_path))
         except Exception as e:
-            logger.error(f"Error reading PDF {filename}: {e}")
-            return ""
+            logger.error(f"Error reading {kind.upper()} {filename}: {e}")
+            return None
+
+    @staticmethod
+    def _load_pdf(file_path: str) -> str:
+        reader = PdfReader(file_path)
+        return "".join((page.extract_text() or "") + "\n\n" for page in reader.pages)
+
+
+    def read_pdf(self, filename: str) -> str:
+        """Read and return text content from a PDF file."""
+        return self._read_cached('pdf', filename, self._load_pdf) or ""
+
+    def read_table(self, filename: str) -> Optional[CsvTable]:
+        """Read a CSV file into a columnar table with its configured indexes."""
+        indexes = self.csv_indexes.get(filename, {})
+        # Tables built with different indexes are cached separately
+        variant = tuple(sorted((c, k if isinstance(k, str) else tuple(k)) for c, k in indexes.items()))
+        return self._read_cached('csv', filename, lambda path: CsvTable.load(path, indexes), variant)
 
     def read_csv(self, filename: str) -> List[Dict]:
         """Read and return list of rows from a CSV file."""
-        if filename in self.document_cache:
-            return self.document_cache[filename]
+        table = self.read_table(filename)
+        return table.rows() if table is not None else []
 
-        file_path = os.path.join(self.data_folder, filename)
-        if not os.path.exists(file_path):
-            logger.warning(f"File not found: {file_path}")
-            return []
+    @property
+    def fulltext(self) -> FullTextIndex:
+        """The full-text index, brought up to date on first use."""
+        with self._fulltext_lock:
+            if self._fulltext is None:
+                index = FullTextIndex(self.index_path, [self.data_folder, self.text_folder])
+                index.refresh()
+                self._fulltext = index
+        return self._fulltext
 
-        try:
-            rows = []
-            with open(file_path, newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    rows.append(row)
-            self.document_cache[filename] = rows
-            return rows
-        except Exception as e:
-            logger.error(f"Error reading CSV {filename}: {e}")
-            return []
+    def search_text(self, query: str, max_results: int = 10) -> List[Dict]:
+        """
+        Search every indexed PDF and text file, best matches first.
+
+        Args:
+            query: Words, "quoted phrases" and prefix* terms.
+            max_results: Maximum number of paragraphs to return.
+        Returns:
+            Dicts with 'source', 'kind', 'page', 'text' and 'score'.
+        """
+        return self.fulltext.search(query, max_results)
 
     def search_pdf(self, filename: str, search_term: str, max_results: int = 5) -> List[str]:
-        """Search for paragraphs containing a term in a PDF file."""
+        """Search for paragraphs matching a term in a PDF file, best matches first."""
+        try:
+            hits = self.fulltext.search(search_term, max_results, sources=[filename])
+            return [hit['text'] for hit in hits]
+        except sqlite3.Error as e:
+            logger.error(f"Full-text index unavailable, scanning {filename}: {e}")
+        return self._scan_pdf(filename, search_term, max_results)
+
+    def _scan_pdf(self, filename: str, search_term: str, max_results: int) -> List[str]:
+        """Substring search over a PDF parsed on the fly."""
         text = self.read_pdf(filename)
         if not text:
             return []
@@ -93,19 +147,29 @@ class MasterRAG:
 
     def search_csv(self, filename: str, column: str, search_term: str) -> List[Dict]:
         """Search for rows where a column contains the search term in a CSV file."""
-        rows = self.read_csv(filename)
-        matches: List[Dict] = []
-        for row in rows:
-            if column in row and search_term.lower() in row[column].lower():
-                matches.append(row)
-        return matches
+        table = self.read_table(filename)
+        if table is None:
+            return []
+        return table.rows(table.contains(column, search_term))
+
+    def lookup_csv(self, filename: str, column: str, value: str) -> List[Dict]:
+        """Return rows whose column equals value, ignoring case and surrounding spaces."""
+        table = self.read_table(filename)
+        if table is None:
+            return []
+        return table.rows(table.lookup(column, value))
 
     def search_all_pdfs(self, search_term: str, max_results: int = 10) -> List[Dict]:
         """Search all PDF files in the data folder for a term and return up to max_results."""
+        try:
+            hits = self.fulltext.search(search_term, max_results, kind='pdf')
+            return [{'source': hit['source'], 'page': hit['page'], 'text': hit['text']} for hit in hits]
+        except sqlite3.Error as e:
+            logger.error(f"Full-text index unavailable, scanning PDFs: {e}")
         results: List[Dict] = []
         pdf_files = [f for f in os.listdir(self.data_folder) if f.lower().endswith('.pdf')]
         for filename in pdf_files:
-            matches = self.search_pdf(filename, search_term, max_results=3)
+            matches = self._scan_pdf(filename, search_term, max_results=3)
             for m in matches:
                 results.append({'source': filename, 'text': m})
                 if len(results) >= max_results:
@@ -113,69 +177,38 @@ class MasterRAG:
         return results
 
     def search_clinvar(self, gene: str, variant: str) -> Dict[str, Any]:
-        """Search for variant information in ClinVar."""
-        cache_key = f"{gene}:{variant}"
-        if cache_key in self.clinvar_cache:
-            logger.info(f"Using cached ClinVar data for {cache_key}")
-            return self.clinvar_cache[cache_key]
+        """
+        Search for variant information in ClinVar.
 
+        Found results are cached under the variant's canonical key, so every
+        spelling of the same change shares them; "not found" is cached per spelling only, so one
+        unmatched spelling never hides the variant from the others.
+        """
         try:
-            search_term = f"{gene}[gene] AND {variant}"
-            logger.info(f"Searching ClinVar for {search_term}")
-
-            params = {
-                "db": "clinvar",
-                "term": search_term,
-                "retmode": "json",
-                "retmax": 5
-            }
-            base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-            response = requests.get(f"{base_url}esearch.fcgi", params=params)
-            response.raise_for_status()
-            search_result = response.json()
-
-            id_list = search_result.get("esearchresult", {}).get("idlist", [])
-            if not id_list:
-                logger.warning(f"No results found for {search_term}")
-                result = {
-                    "found": False,
-                    "gene": gene,
-                    "variant": variant,
-                    "message": "Variant not found in ClinVar"
-                }
-                self.clinvar_cache[cache_key] = result
-                return result
-
-            fetch_params = {
-                "db": "clinvar",
-                "id": ",".join(id_list),
-                "retmode": "json",
-                "rettype": "variation"
-            }
-            time.sleep(0.3)
-            logger.info(f"Fetching details for variant IDs: {id_list}")
-            fetch_response = requests.get(f"{base_url}esummary.fcgi", params=fetch_params)
-            fetch_response.raise_for_status()
-            details = fetch_response.json()
+            cache = get_clinvar_cache()
+            key = variant_key(gene, variant)
+            spelling = f"{gene} {variant}"
+            if cache and cache.get("search", key) is None:
+                missing = cache.get("search_not_found", spelling)
+                if missing is not None:
+                    return dict(missing, variant=variant)
 
-            result = {
-                "found": True,
-                "gene": gene,
-                "variant": variant,
-                "clinvar_data": []
-            }
-            for cid in id_list:
-                var_data = details.get("result", {}).get(cid, {})
-                clinical_sig = var_data.get("clinical_significance", {}).get("description", "Unknown") if "clinical_significance" in var_data else "Unknown"
-                review_status = var_data.get("review_status", "Not provided")
-                result["clinvar_data"].append({
-                    "id": cid,
-                    "clinical_significance": clinical_sig,
-                    "review_status": review_status,
-                    "last_updated": var_data.get("last_updated", "Unknown")
-                })
-            self.clinvar_cache[cache_key] = result
-            return result
+            not_found = []
+
+            def fetch_found():
+                result = self._fetch_clinvar(gene, variant)
+                if result["found"]:
+                    return result
+                not_found.append(result)
+                return None
+
+            result = cached_clinvar("search", key, fetch_found)
+            if result is None:
+                result = not_found[0]
+                if cache:
+                    cache.put("search_not_found", spelling, result)
+            # Cached results may have been fetched for another spelling
+            return dict(result, variant=variant)
         except Exception as e:
             logger.error(f"Error querying ClinVar API: {e}")
             return {
@@ -185,3 +218,55 @@ class MasterRAG:
                 "error": str(e),
                 "message": "Error querying ClinVar API"
             }
+
+    def _fetch_clinvar(self, gene: str, variant: str) -> Dict[str, Any]:
+        """Query ClinVar for a variant; raises on API errors so they are not cached."""
+        search_term = clinvar_term(gene, variant)
+        logger.info(f"Searching ClinVar for {search_term}")
+
+        params = {
+            "db": "clinvar",
+            "term": search_term,
+            "retmode": "json",
+            "retmax": 5
+        }
+        client = get_eutils_client()
+        search_result = client.call("esearch", params)
+
+        id_list = search_result.get("esearchresult", {}).get("idlist", [])
+        if not id_list:
+            logger.warning(f"No results found for {search_term}")
+            result = {
+                "found": False,
+                "gene": gene,
+                "variant": variant,
+                "message": "Variant not found in ClinVar"
+            }
+            return result
+
+        fetch_params = {
+            "db": "clinvar",
+            "id": ",".join(id_list),
+            "retmode": "json",
+            "rettype": "variation"
+        }
+        logger.info(f"Fetching details for variant IDs: {id_list}")
+        details = client.call("esummary", fetch_params)
+
+        result = {
+            "found": True,
+            "gene": gene,
+            "variant": variant,
+            "clinvar_data": []
+        }
+        for cid in id_list:
+            var_data = details.get("result", {}).get(cid, {})
+            clinical_sig = var_data.get("clinical_significance", {}).get("description", "Unknown") if "clinical_significance" in var_data else "Unknown"
+            review_status = var_data.get("review_status", "Not provided")
+            result["clinvar_data"].append({
+                "id": cid,
+                "clinical_significance": clinical_sig,
+                "review_status": review_status,
+                "last_updated": var_data.get("last_updated", "Unknown")
+            })
+        return result
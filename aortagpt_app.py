@@ -8,9 +8,11 @@ from smolagents import LiteLLMModel  # smolagents imports retained for future us
 import threading
 from helper_functions import *
 from vector_search import search_documents
+from context_packer import context_budget, pack_context
 from text_interpretation import TextInterpretationManager
 from report_generator import ReportGenerator
 from chat_prompt import chat_system_prompt
+from clinvar_store import HTAD_GENES
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +21,9 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 client = OpenAI()
 # fallback legacy model wrapper (used by CodeAgent)
 gpt_4_1 = LiteLLMModel(model_id="openai/gpt-4.1", api_key=os.getenv("OPENAI_API_KEY"))
+CHAT_MODEL = "gpt-4.1-nano"
+# Passages retrieved for the chat; the context packer trims them to the budget
+CHAT_CANDIDATES = 10
 
 # Set page configuration
 st.set_page_config(page_title="AortaGPT: Clinical Decision Support Tool", 
@@ -96,11 +101,7 @@ clinical_options = [
 ]
 
 # Supported gene options for filtering and selection
-GENE_OPTIONS = [
-    "FBN1", "TGFBR1", "TGFBR2", "SMAD3", "TGFB2", "TGFB3",
-    "ACTA2", "MYH11", "MYLK", "PRKG1", "LOX", "COL3A1",
-    "SLC2A10", "Other"
-]
+GENE_OPTIONS = HTAD_GENES + ["Other"]
 
 # Initialize ALL session state variables in one place
 if 'history' not in st.session_state:
@@ -167,6 +168,25 @@ with st.sidebar:
         variants_list = st.session_state.variant_cache[cache_key]
         # Search/filter
         search_query = st.text_input("Search variants", value=variant, key="variant_search")
+        # Page further ClinVar results in on demand
+        if variants_list:
+            total_key, pages_key = f"variant_total_{gene}", f"variant_pages_{gene}"
+            if total_key not in st.session_state.variant_cache:
+                st.session_state.variant_cache[total_key] = fetch_variant_count(gene)
+            total = st.session_state.variant_cache[total_key] or 0
+            pages = st.session_state.variant_cache.get(pages_key, 1)
+            loaded = len(variants_list) - 1
+            if total > max(loaded, pages * VARIANT_PAGE_SIZE):
+                st.caption(f"{loaded} of {total} ClinVar variants loaded")
+                if st.button("Load more variants", key="load_more_variants"):
+                    more = fetch_more_variants(gene, pages, loaded=variants_list)
+                    if more is not None:
+                        # Insert before the custom option, which stays last
+                        variants_list[-1:-1] = more
+                        st.session_state.variant_cache[pages_key] = pages + 1
+                    else:
+                        # Leave the page count alone so the same page is retried
+                        st.warning("Could not load more variants from ClinVar. Please try again.")
         filtered_variants = filter_variants(variants_list, search_query)
         # Default index if model suggested exists
         default_idx = 0
@@ -178,7 +198,7 @@ with st.sidebar:
             st.session_state.selected_variant_info = None
         else:
             variant = variant_selection
-            st.session_state.selected_variant_info = fetch_variant_details(variant)
+            st.session_state.selected_variant_info = fetch_variant_details(variant, gene)
     else:
         variant = st.text_input("Enter custom variant", value=variant, key="variant")
         st.session_state.selected_variant_info = None
@@ -364,25 +384,19 @@ with tabs[1]:
                     # Perform vector search
                     results = search_documents(
                         query=context_str,
-                        index_path="data/embeddings.pkl",
-                        top_k=5,
-                        snippet_length=200
+                        top_k=CHAT_CANDIDATES,
+                        snippet_length=400,
+                        mode="hybrid"
                     )
                     st.session_state.search_results = results
                 except Exception as e:
                     st.error(f"Error searching documents: {e}")
                     st.session_state.search_results = []
             
-            # Build dynamic context from retrieved documents
+            # Build dynamic context from retrieved documents, deduplicated
+            # and packed into the chat model's token budget
             docs = st.session_state.get("search_results", []) or []
-            context_lines = []
-            for doc in docs:
-                context_lines.append(
-                    f"Source: {doc.get('file','Unknown')}"
-                    f" (score: {doc.get('score',0):.3f})\n"
-                    f"Snippet: {doc.get('snippet','')}"
-                )
-            dynamic_context = "\n\n".join(context_lines)
+            dynamic_context = pack_context([(None, docs)], context_budget(CHAT_MODEL)).text
             
             # Build patient context string for the chat
             patient_context = build_patient_context(st.session_state, clinical_options)
@@ -409,7 +423,7 @@ with tabs[1]:
             st.session_state.chat_history.append({"role": "user", "content": user_input})
             with st.spinner("AortaGPT is thinking..."):
                 response = client.responses.create(
-                    model="gpt-4.1-nano",
+                    model=CHAT_MODEL,
                     input=st.session_state.chat_history
                 )
             assistant_msg = ''
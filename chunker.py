@@ -0,0 +1,207 @@
+"""
+Structure-aware, streaming chunker for guideline and GeneReviews text.
+
+Text extracted from PDFs arrives as hard-wrapped lines. Lines are grouped
+into blocks that end at paragraph-like boundaries (blank lines, bullets,
+headings, lines ending a sentence), and blocks are packed into chunks under
+a token budget. A heading starts a new chunk, so recommendation tables and
+COR/LOE rows stay with their section instead of being cut at a fixed
+character offset.
+
+Headings are recognized heuristically:
+  numbered     "6.1.2. Genetic Aortopathies", nested under the headings whose
+               numbers prefix its own ("6.1.", "6.");
+               numbered list items such as "1. In patients with ..." are
+               told apart by their mostly lowercase words
+  short title  "Natural history" -- a short line with no sentence
+               punctuation that follows the end of a sentence
+Lines ending in a number (running page headers) are never headings.
+
+The chunker consumes any iterable of lines (e.g. an open file) and yields
+chunks as it goes, so a file is never held in memory as a whole.
+"""
+import os
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from generate_embeddings import estimate_tokens
+
+# Chunk size in tokens; sections shorter than MIN_CHUNK_TOKENS are merged
+# into the following chunk rather than emitted on their own
+MAX_CHUNK_TOKENS = 400
+MIN_CHUNK_TOKENS = 60
+
+# "6.1.2. Title", "6.1.2 Title" or "6. Title"
+_NUMBERED_HEADING_RE = re.compile(r'^(\d+(?:\.\d+)+|\d+(?=\.))\.?\s+([A-Z].*)$')
+_WORD_RE = re.compile(r'[A-Za-z]+')
+# Table-of-contents entries: dot leaders
+_DOT_LEADER_RE = re.compile(r'\.{4,}|(?:\. ){3,}')
+_BULLET_RE = re.compile(r'^\s*(?:[•▪◦\-–*]|\(?[a-z0-9]{1,2}[.)])\s+')
+_SENTENCE_END_RE = re.compile(r'[.!?:;]["\')\]]?\d*\s*$')
+MAX_HEADING_CHARS = 80
+MAX_TITLE_WORDS = 6
+
+
+class Chunk(NamedTuple):
+    """A chunk of a document and where it came from."""
+    doc: str
+    start: int
+    end: int
+    section: str
+    page: Optional[int]
+
+
+def heading_level(line: str, after_sentence_end: bool) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Classify a line as a heading.
+
+    Returns:
+        (number, title) for a heading -- number is e.g. '6.1.2', or None for
+        unnumbered titles -- or None for body text.
+    """
+    text = line.strip()
+    if not text or len(text) > MAX_HEADING_CHARS or _DOT_LEADER_RE.search(text):
+        return None
+    if _SENTENCE_END_RE.search(text) or text.endswith(('-', ',')) or text[-1].isdigit():
+        return None
+    match = _NUMBERED_HEADING_RE.match(text)
+    if match:
+        words = [w for w in _WORD_RE.findall(match.group(2)) if len(w) > 3]
+        if words and sum(w[0].isupper() for w in words) * 3 >= len(words) * 2:
+            return match.group(1), text
+        return None
+    words = text.split()
+    if (after_sentence_end and len(words) <= MAX_TITLE_WORDS and text[0].isupper()
+            and ',' not in text and any(c.isalpha() for c in text)):
+        return None, text
+    return None
+
+
+def _blocks(lines: Iterable[str]) -> Iterator[Tuple[int, int, str, Optional[Tuple[Optional[str], str]]]]:
+    """
+    Group lines into blocks.
+
+    Yields:
+        (start, end, text, heading) per block; heading is set for heading
+        lines, which are always blocks of their own.
+    """
+    offset = 0
+    block: List[str] = []
+    block_start = 0
+    after_sentence_end = True
+    for line in lines:
+        line_start, offset = offset, offset + len(line)
+        stripped = line.strip()
+        heading = heading_level(line, after_sentence_end) if stripped else None
+        if block and (heading is not None or not stripped or _BULLET_RE.match(line)):
+            # The line starts a new block
+            yield block_start, line_start, ''.join(block), None
+            block = []
+        if not block:
+            block_start = line_start
+        block.append(line)
+        if stripped:
+            after_sentence_end = heading is not None or bool(_SENTENCE_END_RE.search(stripped))
+        if heading is not None or (stripped and after_sentence_end):
+            yield block_start, offset, ''.join(block), heading
+            block = []
+    if block:
+        yield block_start, offset, ''.join(block), None
+
+
+def _update_path(path: List[Tuple[Optional[str], str]], number: Optional[str], title: str):
+    """Place a heading in the section path."""
+    if number is None:
+        # Unnumbered titles nest under the innermost numbered heading
+        while path and path[-1][0] is None:
+            path.pop()
+    else:
+        path[:] = [(n, t) for n, t in path if n is not None and number.startswith(n + '.')]
+    path.append((number, title))
+
+
+def _split_block(text: str, offset: int, max_tokens: int) -> Iterator[Tuple[int, int]]:
+    """Cut an oversized block into pieces of about max_tokens at whitespace."""
+    pos = 0
+    while pos < len(text):
+        # Grow the piece until it exceeds the budget, then back off to a space
+        size = max_tokens * 4
+        while pos + size < len(text) and estimate_tokens(text[pos:pos + size]) < max_tokens:
+            size *= 2
+        end = pos + size
+        while end < len(text) and estimate_tokens(text[pos:end]) > max_tokens and end - pos > 1:
+            end = pos + (end - pos) * 3 // 4
+        if end < len(text):
+            cut = text.rfind(' ', pos + 1, end)
+            end = cut + 1 if cut > pos else end
+        else:
+            end = len(text)
+        yield offset + pos, offset + end
+        pos = end
+
+
+def iter_chunks(lines: Iterable[str], doc: str, max_tokens: int = MAX_CHUNK_TOKENS,
+                min_tokens: int = MIN_CHUNK_TOKENS,
+                page_starts: Optional[Sequence[int]] = None) -> Iterator[Chunk]:
+    """
+    Split a document into structure-aligned chunks.
+
+    Args:
+        lines: The document's lines, with line endings (e.g. an open file).
+        doc: Document name recorded in each chunk.
+        max_tokens: Token budget per chunk.
+        min_tokens: A heading only closes the current chunk once it holds
+            at least this many tokens.
+        page_starts: Sorted character offsets at which pages start; if
+            given, each chunk records the 1-based page it starts on.
+    Yields:
+        Chunks in document order. Spans are contiguous and cover the whole
+        document.
+    """
+    path: List[Tuple[Optional[str], str]] = []
+    # The chunk being filled: [start, end) span, token count, section path
+    start = end = 0
+    tokens = 0
+    section = ''
+
+    def page_of(offset: int) -> Optional[int]:
+        if not page_starts:
+            return None
+        return max(bisect_right(page_starts, offset), 1)
+
+    def flush() -> Chunk:
+        return Chunk(doc, start, end, section, page_of(start))
+
+    for block_start, block_end, text, heading in _blocks(lines):
+        if heading is not None:
+            if tokens >= min_tokens:
+                yield flush()
+                start, tokens = end, 0
+            _update_path(path, *heading)
+            if tokens == 0:
+                section = ' > '.join(title for _, title in path)
+        block_tokens = estimate_tokens(text)
+        if tokens and tokens + block_tokens > max_tokens:
+            yield flush()
+            start, tokens = end, 0
+            section = ' > '.join(title for _, title in path)
+        if block_tokens <= max_tokens:
+            end = block_end
+            tokens += block_tokens
+            continue
+        # A block with no usable boundary (e.g. a long table row run)
+        for piece_start, piece_end in _split_block(text, block_start, max_tokens):
+            end = piece_end
+            if piece_end < block_end:
+                yield flush()
+                start = end
+            else:
+                tokens = estimate_tokens(text[piece_start - block_start:])
+    if end > start:
+        yield flush()
+
+
+def chunk_file(path: str, doc: Optional[str] = None, **options) -> Iterator[Chunk]:
+    """Stream chunks of a UTF-8 text file; options are passed to iter_chunks."""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_chunks(f, doc or os.path.basename(path), **options)
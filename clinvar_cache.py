@@ -0,0 +1,223 @@
+"""
+Persistent, cross-session cache for ClinVar E-utilities results.
+
+Results of variant list, variant detail and MasterRAG lookups are stored as
+JSON in SQLite keyed by (kind, normalized query), so every Streamlit session
+and every restart of the process reuses them. Entries are fresh for the TTL
+(AORTAGPT_CLINVAR_TTL seconds, default one hour). After that, and for up to
+AORTAGPT_CLINVAR_STALE seconds more (default one week), the stale value is
+returned at once while a background thread refreshes it; older entries are
+fetched synchronously. Failed fetches are never cached.
+"""
+import os
+import re
+import time
+import json
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.getenv(
+    "AORTAGPT_CLINVAR_CACHE",
+    os.path.join(BASE_DIR, "data", "cache", "clinvar.sqlite")
+)
+DEFAULT_TTL = float(os.getenv("AORTAGPT_CLINVAR_TTL", "3600"))
+DEFAULT_STALE_TTL = float(os.getenv("AORTAGPT_CLINVAR_STALE", str(7 * 24 * 3600)))
+REFRESH_WORKERS = 2
+
+_refresh_state = threading.local()
+
+
+def in_background_refresh() -> bool:
+    """True on a thread running a background refresh, where fetches must not touch the UI."""
+    return getattr(_refresh_state, 'active', False)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: case-folded with whitespace collapsed."""
+    return re.sub(r'\s+', ' ', query).strip().casefold()
+
+
+class ClinVarCache:
+    """
+    SQLite-backed TTL cache with stale-while-revalidate refresh.
+
+    Safe to share between threads; separate processes share the same file.
+    Cache errors are logged and treated as misses so that lookups never
+    fail because of the cache.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 stale_ttl: float = DEFAULT_STALE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._refreshing: Set[Tuple[str, str]] = set()
+        self._pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="clinvar-refresh")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " kind TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, key))"
+            )
+
+    def _read(self, kind: str, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, fetched_at FROM responses WHERE kind = ? AND key = ?", (kind, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"ClinVar cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, kind: str, query: str, value: Any):
+        """Store a result for a query."""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (kind, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+                    (kind, normalize_query(query), json.dumps(value), time.time())
+                )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"ClinVar cache write failed: {e}")
+
+    def get(self, kind: str, query: str) -> Any:
+        """Return the result cached for a query if it is still fresh, else None."""
+        cached = self._read(kind, normalize_query(query))
+        if cached is None or time.time() - cached[1] >= self.ttl:
+            return None
+        return cached[0]
+
+    def get_or_fetch(self, kind: str, query: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for a query, calling fetch() when needed.
+
+        Args:
+            kind: Result family, e.g. 'variants' or 'details'.
+            query: The query; normalized with normalize_query for the key.
+            fetch: Returns the fresh result, or None on failure (not cached).
+        Returns:
+            The cached or fetched result (None if the fetch failed).
+        """
+        cached = self._read(kind, normalize_query(query))
+        if cached is not None:
+            value, fetched_at = cached
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh_later(kind, query, fetch)
+                return value
+        self.misses += 1
+        value = fetch()
+        if value is None:
+            self.errors += 1
+        else:
+            self.put(kind, query, value)
+        return value
+
+    def _refresh_later(self, kind: str, query: str, fetch: Callable[[], Any]):
+        """Refresh an entry in the background, once per key at a time."""
+        token = (kind, normalize_query(query))
+        with self._lock:
+            if token in self._refreshing:
+                return
+            self._refreshing.add(token)
+
+        def refresh():
+            _refresh_state.active = True
+            try:
+                value = fetch()
+                if value is None:
+                    self.errors += 1
+                else:
+                    self.put(kind, query, value)
+                    self.refreshes += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Background ClinVar refresh of {token} failed: {e}")
+            finally:
+                _refresh_state.active = False
+                with self._lock:
+                    self._refreshing.discard(token)
+
+        self._pool.submit(refresh)
+
+    def invalidate(self, kind: str, query: str):
+        """Drop one cached result."""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE kind = ? AND key = ?", (kind, normalize_query(query))
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"ClinVar cache delete failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/stale/miss/refresh/error counters and entry count."""
+        entries = 0
+        try:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"ClinVar cache stats failed: {e}")
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            'refreshes': self.refreshes,
+            'errors': self.errors,
+            'entries': entries,
+        }
+
+
+_default_cache: Optional[ClinVarCache] = None
+_default_disabled = False
+_default_lock = threading.Lock()
+
+
+def get_clinvar_cache() -> Optional[ClinVarCache]:
+    """Return the process-wide cache, or None if it cannot be opened."""
+    global _default_cache, _default_disabled
+    if _default_cache is None and not _default_disabled:
+        with _default_lock:
+            if _default_cache is None and not _default_disabled:
+                try:
+                    _default_cache = ClinVarCache()
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"ClinVar cache disabled: {e}")
+                    _default_disabled = True
+    return _default_cache
+
+
+def cached_clinvar(kind: str, query: str, fetch: Callable[[], Any]) -> Any:
+    """get_or_fetch on the process-wide cache, or fetch() if it is unavailable."""
+    cache = get_clinvar_cache()
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(kind, query, fetch)
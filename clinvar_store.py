@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Offline ClinVar variant store built from the bulk variant_summary file.
+
+ClinVar publishes every variant as one tab-separated row (per genome
+assembly) in variant_summary.txt.gz:
+  https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz
+The ingest command streams that file (or any subset with the same header),
+keeps the HTAD genes (or all genes) and writes a compact SQLite store with
+one row per VariationID: gene symbols, the ClinVar name (the same string
+esummary returns as 'title'), its c. and p. changes in the canonical form of
+hgvs_normalize.py, clinical significance, review status and last evaluation
+date.
+
+helper_functions answers variant lists and details from this store with no
+network calls when it exists and covers the gene, and falls back to
+E-utilities otherwise. The store lives at AORTAGPT_CLINVAR_STORE (default
+data/clinvar/variant_store.sqlite).
+
+Commands:
+  ingest <variant_summary.txt[.gz]> [--all-genes | --genes FBN1 ACTA2 ...]
+         [--output <path>]                Build the store
+  stats [--store <path>]                  Show the store's contents
+"""
+import os
+import re
+import csv
+import gzip
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from hgvs_normalize import parse_variant
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PATH = os.getenv(
+    "AORTAGPT_CLINVAR_STORE",
+    os.path.join(BASE_DIR, "data", "clinvar", "variant_store.sqlite")
+)
+# Genes offered in the app's gene picker
+HTAD_GENES = [
+    "FBN1", "TGFBR1", "TGFBR2", "SMAD3", "TGFB2", "TGFB3",
+    "ACTA2", "MYH11", "MYLK", "PRKG1", "LOX", "COL3A1",
+    "SLC2A10",
+]
+CLINVAR_VARIATION_URL = "https://www.ncbi.nlm.nih.gov/clinvar/variation/{}/"
+INSERT_BATCH = 5000
+
+_PLP_TERMS = {'pathogenic', 'likely pathogenic'}
+
+
+def is_pathogenic(significance: str) -> bool:
+    """True for Pathogenic / Likely pathogenic classifications, alone or combined."""
+    parts = re.split(r'[/;,]', significance.lower())
+    return any(part.strip() in _PLP_TERMS for part in parts)
+
+
+def _open_text(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_variant_rows(path: str, genes: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream variants from a variant_summary file.
+
+    Args:
+        path: variant_summary.txt or .txt.gz.
+        genes: Gene symbols to keep (None keeps every gene).
+    Yields:
+        One dict per row whose GeneSymbol list includes a kept gene; rows
+        repeat per assembly, so a VariationID can appear more than once.
+    """
+    wanted = {g.upper() for g in genes} if genes is not None else None
+    with _open_text(path) as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)
+        header[0] = header[0].lstrip('#')
+        col = {name: i for i, name in enumerate(header)}
+        required = ('VariationID', 'Name', 'GeneSymbol', 'ClinicalSignificance', 'ReviewStatus', 'LastEvaluated')
+        missing = [name for name in required if name not in col]
+        if missing:
+            raise ValueError(f"{path} is not a variant_summary file: missing columns {missing}")
+        for row in reader:
+            if len(row) < len(header):
+                continue
+            symbols = [s for s in row[col['GeneSymbol']].split(';') if s and s != '-']
+            if wanted is not None and not wanted.intersection(s.upper() for s in symbols):
+                continue
+            yield {
+                'variation_id': int(row[col['VariationID']]),
+                'genes': symbols,
+                'name': row[col['Name']],
+                'significance': row[col['ClinicalSignificance']],
+                'review_status': row[col['ReviewStatus']],
+                'last_evaluated': row[col['LastEvaluated']],
+            }
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute(
+        "CREATE TABLE variants ("
+        " variation_id INTEGER PRIMARY KEY,"
+        " genes TEXT NOT NULL,"
+        " name TEXT NOT NULL,"
+        " hgvs_c TEXT,"
+        " hgvs_p TEXT,"
+        " significance TEXT NOT NULL,"
+        " pathogenic INTEGER NOT NULL,"
+        " review_status TEXT NOT NULL,"
+        " last_evaluated TEXT NOT NULL)"
+    )
+    conn.execute("CREATE TABLE variant_genes (gene TEXT NOT NULL, variation_id INTEGER NOT NULL,"
+                 " PRIMARY KEY (gene, variation_id)) WITHOUT ROWID")
+    conn.execute("CREATE INDEX variants_name ON variants (name COLLATE NOCASE)")
+    conn.execute("CREATE INDEX variants_hgvs_c ON variants (hgvs_c)")
+    conn.execute("CREATE INDEX variants_hgvs_p ON variants (hgvs_p)")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+
+def ingest(source: str, output: str = DEFAULT_STORE_PATH,
+           genes: Optional[Sequence[str]] = HTAD_GENES) -> Dict[str, int]:
+    """
+    Build the store from a variant_summary file in one streaming pass.
+
+    The store is written to a temporary file and moved into place at the
+    end, so readers never see a partial store.
+
+    Args:
+        source: variant_summary.txt or .txt.gz.
+        output: Store path.
+        genes: Genes to keep; None keeps all genes.
+    Returns:
+        Counts of 'rows' read and 'variants' stored.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp_path = output + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    rows = 0
+    try:
+        _create_schema(conn)
+        batch: List[Tuple] = []
+        gene_batch: List[Tuple[str, int]] = []
+
+        def flush():
+            conn.executemany("INSERT OR IGNORE INTO variants VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.executemany("INSERT OR IGNORE INTO variant_genes VALUES (?, ?)", gene_batch)
+            batch.clear()
+            gene_batch.clear()
+
+        for record in iter_variant_rows(source, genes):
+            rows += 1
+            parsed = parse_variant(record['name'])
+            batch.append((
+                record['variation_id'], ';'.join(record['genes']), record['name'], parsed.c, parsed.p,
+                record['significance'], int(is_pathogenic(record['significance'])),
+                record['review_status'], record['last_evaluated'],
+            ))
+            gene_batch.extend((g.upper(), record['variation_id']) for g in record['genes'])
+            if len(batch) >= INSERT_BATCH:
+                flush()
+        flush()
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('source', os.path.basename(source)),
+            ('ingested_at', str(time.time())),
+            ('genes', '*' if genes is None else ';'.join(g.upper() for g in genes)),
+        ])
+        conn.commit()
+        variants = conn.execute("SELECT COUNT(*) FROM variants").fetchone()[0]
+    finally:
+        conn.close()
+    os.replace(tmp_path, output)
+    return {'rows': rows, 'variants': variants}
+
+
+class VariantStore:
+    """Read-only access to an ingested store. Safe to share between threads."""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.source = meta.get('source')
+        genes = meta.get('genes', '*')
+        self.genes = None if genes == '*' else set(genes.split(';'))
+
+    def covers(self, gene: str) -> bool:
+        """True if the snapshot was ingested with this gene (or with all genes)."""
+        return self.genes is None or gene.upper() in self.genes
+
+    def variant_names(self, gene: str, pathogenic_only: bool = True) -> List[str]:
+        """ClinVar names of a gene's variants, newest VariationID first."""
+        sql = ("SELECT v.name FROM variant_genes g JOIN variants v USING (variation_id)"
+               " WHERE g.gene = ?")
+        if pathogenic_only:
+            sql += " AND v.pathogenic = 1"
+        sql += " ORDER BY v.variation_id DESC"
+        with self._lock:
+            return [name for (name,) in self._conn.execute(sql, (gene.upper(),))]
+
+    def details(self, name: str, gene: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Details of a variant in fetch_variant_details' format.
+
+        Args:
+            name: ClinVar name, or any notation hgvs_normalize understands
+                (e.g. "R179H", "c.536G>A"), which is then matched on the
+                gene's canonical c. change, or on its p. change only when
+                the name has no c. change.
+            gene: Gene symbol; taken from the name if it is a ClinVar title.
+        """
+        columns = "v.variation_id, v.significance, v.review_status, v.last_evaluated"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns} FROM variants v WHERE v.name = ? COLLATE NOCASE LIMIT 1", (name.strip(),)
+            ).fetchone()
+            parsed = parse_variant(name, gene)
+            if row is None and parsed.gene:
+                # A c. change identifies the variant; a p. change can come from several,
+                # so it is only matched when the query has no c. change
+                column, value = ('hgvs_c', parsed.c) if parsed.c else ('hgvs_p', parsed.p)
+                if value is not None:
+                    row = self._conn.execute(
+                        f"SELECT {columns} FROM variant_genes g JOIN variants v USING (variation_id)"
+                        f" WHERE g.gene = ? AND v.{column} = ? ORDER BY v.pathogenic DESC, v.variation_id DESC LIMIT 1",
+                        (parsed.gene, value)
+                    ).fetchone()
+        if row is None:
+            return None
+        variation_id, significance, review_status, last_evaluated = row
+        return {
+            "clinical_significance": significance or 'Not available',
+            "review_status": review_status or 'Not available',
+            "last_updated": last_evaluated if last_evaluated and last_evaluated != '-' else 'Not available',
+            "variant_id": str(variation_id),
+            "sources": [],
+            "clinvar_url": CLINVAR_VARIATION_URL.format(variation_id),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return variant counts per gene."""
+        with self._lock:
+            per_gene = dict(self._conn.execute(
+                "SELECT gene, COUNT(*) FROM variant_genes GROUP BY gene ORDER BY gene"
+            ))
+            total, pathogenic = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pathogenic), 0) FROM variants"
+            ).fetchone()
+        return {'path': self.path, 'source': self.source, 'variants': total,
+                'pathogenic': pathogenic, 'genes': per_gene}
+
+
+_default_store: Optional[VariantStore] = None
+_default_mtime: Optional[float] = None
+_default_lock = threading.Lock()
+
+
+def get_variant_store() -> Optional[VariantStore]:
+    """Return the store at DEFAULT_STORE_PATH, or None if none has been ingested."""
+    global _default_store, _default_mtime
+    try:
+        mtime = os.path.getmtime(DEFAULT_STORE_PATH)
+    except OSError:
+        return None
+    with _default_lock:
+        # Reopen after a re-ingest replaced the file
+        if _default_store is None or mtime != _default_mtime:
+            try:
+                _default_store = VariantStore(DEFAULT_STORE_PATH)
+                _default_mtime = mtime
+            except sqlite3.Error as e:
+                logger.warning(f"ClinVar variant store unavailable: {e}")
+                return None
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ClinVar variant store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_cmd = subparsers.add_parser('ingest', help='Build the store from variant_summary.txt[.gz]')
+    ingest_cmd.add_argument('source', help='Path to variant_summary.txt or .txt.gz')
+    ingest_cmd.add_argument('--output', default=DEFAULT_STORE_PATH, help='Store path')
+    genes = ingest_cmd.add_mutually_exclusive_group()
+    genes.add_argument('--all-genes', action='store_true', help='Keep every gene, not just the HTAD genes')
+    genes.add_argument('--genes', nargs='+', help='Genes to keep (default: the HTAD genes)')
+
+    stats = subparsers.add_parser('stats', help="Show the store's contents")
+    stats.add_argument('--store', default=DEFAULT_STORE_PATH, help='Store path')
+
+    args = parser.parse_args()
+    if args.command == 'ingest':
+        start = time.perf_counter()
+        genes_to_keep = None if args.all_genes else (args.genes or HTAD_GENES)
+        counts = ingest(args.source, args.output, genes_to_keep)
+        print(f"Read {counts['rows']} rows, stored {counts['variants']} variants in "
+              f"{args.output} ({time.perf_counter() - start:.1f} s)")
+    elif args.command == 'stats':
+        if not os.path.exists(args.store):
+            print(f"No store at {args.store}")
+            return
+        info = VariantStore(args.store).stats()
+        print(f"{info['path']} (from {info['source']}): {info['variants']} variants, "
+              f"{info['pathogenic']} pathogenic/likely pathogenic")
+        for gene, count in info['genes'].items():
+            print(f"  {gene}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Token-budgeted packing of retrieved passages into LLM prompts.
+
+Retrieval returns more candidates than a prompt should hold, and the same
+passage is often retrieved by several queries (or, in indexes built with the
+old fixed-size chunker, from two overlapping chunks). The packer drops
+passages that overlap one already packed, then greedily fills a per-model
+token budget, taking every section's best remaining passage in turn so that
+no section starves the others.
+
+Budgets can be tuned per deployment with AORTAGPT_CONTEXT_BUDGETS, e.g.
+"gpt-4.1=8000,gpt-4.1-nano=2000".
+"""
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from generate_embeddings import estimate_tokens
+
+# Tokens of retrieved context per model
+DEFAULT_CONTEXT_BUDGETS = {
+    'gpt-4.1': 6000,
+    'gpt-4.1-mini': 4000,
+    'gpt-4.1-nano': 2500,
+}
+DEFAULT_CONTEXT_BUDGET = 3000
+# Passages sharing at least this fraction of the shorter one are duplicates
+OVERLAP_THRESHOLD = 0.5
+
+
+def _parse_budgets(value: str) -> Dict[str, int]:
+    budgets = {}
+    for item in value.split(','):
+        model, _, tokens = item.partition('=')
+        if model.strip() and tokens.strip().isdigit():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+CONTEXT_BUDGETS = {**DEFAULT_CONTEXT_BUDGETS, **_parse_budgets(os.getenv("AORTAGPT_CONTEXT_BUDGETS", ""))}
+
+
+def context_budget(model: str) -> int:
+    """Token budget for retrieved context in prompts to model."""
+    return CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+
+class PackedContext(NamedTuple):
+    """Prompt-ready context and what went into it."""
+    text: str
+    tokens: int
+    passages: List[Dict[str, Any]]
+    dropped_duplicates: int
+    dropped_over_budget: int
+
+
+def _span(hit: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    start = hit.get('snippet_start', hit.get('start'))
+    end = hit.get('snippet_end', hit.get('end'))
+    if start is None or end is None:
+        return None
+    return int(start), int(end)
+
+
+def _is_duplicate(hit: Dict[str, Any], packed: Dict[str, List[Tuple[int, int]]],
+                  seen_texts: set) -> bool:
+    """True if hit repeats text or mostly overlaps a span already packed."""
+    if _normalize(hit.get('snippet', '')) in seen_texts:
+        return True
+    span = _span(hit)
+    if span is None:
+        return False
+    for start, end in packed.get(hit.get('file'), ()):
+        overlap = min(end, span[1]) - max(start, span[0])
+        shorter = max(min(end - start, span[1] - span[0]), 1)
+        if overlap / shorter >= OVERLAP_THRESHOLD:
+            return True
+    return False
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def format_passage(hit: Dict[str, Any]) -> str:
+    """Render one retrieved passage for a prompt."""
+    source = hit.get('source') or hit.get('file', 'Unknown')
+    if hit.get('page'):
+        source += f", p. {hit['page']}"
+    if hit.get('section'):
+        source += f" ({hit['section']})"
+    return f"Source: {source}\nContent: {hit.get('snippet', '')}"
+
+
+def pack_context(sections: Sequence[Tuple[Optional[str], List[Dict[str, Any]]]],
+                 max_tokens: int) -> PackedContext:
+    """
+    Fill a token budget with ranked passages from one or more sections.
+
+    Args:
+        sections: (label, ranked hits) pairs, e.g. one per retrieval query.
+            Hits are search_documents result dicts. A None label renders the
+            section without a heading.
+        max_tokens: Token budget for the rendered context.
+    Returns:
+        PackedContext with the rendered text (sections in their given order,
+        passages in rank order) and packing statistics.
+    """
+    packed_spans: Dict[str, List[Tuple[int, int]]] = {}
+    seen_texts = set()
+    chosen: List[List[Dict[str, Any]]] = [[] for _ in sections]
+    headings = [estimate_tokens(f"### {label}\n") if label else 0 for label, _ in sections]
+    used = 0
+    duplicates = 0
+    over_budget = 0
+    depth = max((len(hits) for _, hits in sections), default=0)
+    # Round-robin by rank: every section's best passage before any second-best
+    for rank in range(depth):
+        for i, (_, hits) in enumerate(sections):
+            if rank >= len(hits):
+                continue
+            hit = hits[rank]
+            if not hit.get('snippet') or _is_duplicate(hit, packed_spans, seen_texts):
+                duplicates += 1
+                continue
+            cost = estimate_tokens(format_passage(hit)) + 1
+            if not chosen[i]:
+                cost += headings[i]
+            if used + cost > max_tokens:
+                over_budget += 1
+                continue
+            used += cost
+            chosen[i].append(hit)
+            seen_texts.add(_normalize(hit['snippet']))
+            span = _span(hit)
+            if span is not None:
+                packed_spans.setdefault(hit.get('file'), []).append(span)
+
+    blocks = []
+    for (label, _), hits in zip(sections, chosen):
+        if not hits:
+            continue
+        body = "\n\n".join(format_passage(hit) for hit in hits)
+        blocks.append(f"### {label}\n{body}" if label else body)
+    return PackedContext(
+        text="\n\n".join(blocks),
+        tokens=used,
+        passages=[hit for hits in chosen for hit in hits],
+        dropped_duplicates=duplicates,
+        dropped_over_budget=over_budget,
+    )
@@ -0,0 +1,145 @@
+"""
+Columnar, indexed representation of CSV datasets.
+
+A CsvTable keeps each column as a list of cell strings next to a normalized
+(case-folded, stripped) copy computed once at load time, so queries never
+re-normalize cells. Columns can additionally be indexed:
+
+  exact   hash index: normalized value -> row ids, for whole-value lookups
+          such as gene symbols
+  ngram   trigram index: trigram -> sorted row ids; substring queries
+          intersect the posting lists of the term's trigrams and verify
+          only the surviving rows
+
+Columns without an index are searched by scanning their normalized copy.
+"""
+import csv
+import sys
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ('exact', 'ngram')
+NGRAM = 3
+
+# Per-column index selection: 'exact', 'ngram' or both
+IndexSpec = Mapping[str, Union[str, Sequence[str]]]
+
+
+def normalize(value: Optional[str]) -> str:
+    """Normalized form of a cell or query used for matching."""
+    return (value or '').strip().casefold()
+
+
+def _ngrams(text: str) -> Iterable[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class CsvTable:
+    """A CSV file held column by column, with optional per-column indexes."""
+
+    def __init__(self, fieldnames: Sequence[str], columns: Dict[str, List[str]]):
+        self.fieldnames = list(fieldnames)
+        self.columns = columns
+        self.num_rows = len(columns[self.fieldnames[0]]) if self.fieldnames else 0
+        self.normalized = {name: [normalize(v) for v in values] for name, values in columns.items()}
+        self.exact_indexes: Dict[str, Dict[str, np.ndarray]] = {}
+        self.ngram_indexes: Dict[str, Dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def load(cls, path: str, indexes: Optional[IndexSpec] = None) -> 'CsvTable':
+        """
+        Read a CSV file with a header row.
+
+        Args:
+            path: CSV file path.
+            indexes: Column name -> index kind(s) to build, e.g.
+                {'gene': 'exact', 'hgvs': ('exact', 'ngram')}.
+        """
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            fieldnames = next(reader, [])
+            columns: Dict[str, List[str]] = {name: [] for name in fieldnames}
+            lists = [columns[name] for name in fieldnames]
+            for row in reader:
+                # Short rows are padded and extra cells dropped, as DictReader would
+                for values, cell in zip(lists, row + [''] * (len(lists) - len(row))):
+                    values.append(cell)
+        table = cls(fieldnames, columns)
+        for column, kinds in (indexes or {}).items():
+            for kind in ([kinds] if isinstance(kinds, str) else kinds):
+                table.build_index(column, kind)
+        return table
+
+    def build_index(self, column: str, kind: str):
+        """Build an 'exact' or 'ngram' index on a column."""
+        if column not in self.columns:
+            logger.warning(f"Cannot index missing column {column!r}")
+            return
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {kind!r}; expected one of {INDEX_KINDS}")
+        postings: Dict[str, List[int]] = {}
+        for row, value in enumerate(self.normalized[column]):
+            keys = (value,) if kind == 'exact' else _ngrams(value)
+            for key in keys:
+                postings.setdefault(key, []).append(row)
+        index = {key: np.asarray(rows, dtype=np.int32) for key, rows in postings.items()}
+        (self.exact_indexes if kind == 'exact' else self.ngram_indexes)[column] = index
+
+    def lookup(self, column: str, value: str) -> List[int]:
+        """Row ids whose cell equals value after normalization."""
+        if column not in self.columns:
+            return []
+        key = normalize(value)
+        index = self.exact_indexes.get(column)
+        if index is not None:
+            return index.get(key, np.empty(0, dtype=np.int32)).tolist()
+        return [row for row, cell in enumerate(self.normalized[column]) if cell == key]
+
+    def contains(self, column: str, term: str) -> List[int]:
+        """Row ids whose cell contains term after normalization, in row order."""
+        if column not in self.columns:
+            return []
+        term = term.casefold()
+        cells = self.normalized[column]
+        index = self.ngram_indexes.get(column)
+        if index is None or len(term) < NGRAM:
+            return [row for row, cell in enumerate(cells) if term in cell]
+        postings = []
+        for gram in _ngrams(term):
+            rows = index.get(gram)
+            if rows is None:
+                return []
+            postings.append(rows)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for rows in postings[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                return []
+        # Trigrams can co-occur without forming the term
+        return [row for row in candidates.tolist() if term in cells[row]]
+
+    def row(self, row: int) -> Dict[str, str]:
+        """One row as a dict, like csv.DictReader yields."""
+        return {name: self.columns[name][row] for name in self.fieldnames}
+
+    def rows(self, row_ids: Optional[Iterable[int]] = None) -> List[Dict[str, str]]:
+        """Rows as dicts, all of them by default."""
+        ids = range(self.num_rows) if row_ids is None else row_ids
+        return [self.row(r) for r in ids]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and indexes."""
+        size = 0
+        for values in list(self.columns.values()) + list(self.normalized.values()):
+            size += sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+        for indexes in (self.exact_indexes, self.ngram_indexes):
+            for index in indexes.values():
+                size += sys.getsizeof(index) + sum(
+                    sys.getsizeof(k) + rows.nbytes for k, rows in index.items()
+                )
+        return size
@@ -0,0 +1,187 @@
+"""
+Bounded, thread-safe in-memory cache for parsed documents and API results.
+
+Entries are evicted least recently used first once their estimated total
+size exceeds a byte budget, so memory stays flat however many documents and
+variants a long-running deployment touches. Concurrent requests for a key
+that is being loaded wait for that one load instead of repeating it.
+
+The process-wide cache returned by shared_document_cache() is sized by
+AORTAGPT_DOCUMENT_CACHE_MB (default 128).
+"""
+import os
+import sys
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv("AORTAGPT_DOCUMENT_CACHE_MB", "128")) * 1024 * 1024
+
+
+def estimate_bytes(value: Any) -> int:
+    """
+    Approximate memory held by a value, following lists, tuples and dicts.
+
+    Objects with an integer nbytes attribute (NumPy arrays, CsvTable) report
+    their own size.
+    """
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_bytes(item) for item in value)
+    return size
+
+
+class _Load:
+    """A load in progress that other threads can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class DocumentCache:
+    """
+    Byte-bounded LRU cache with per-key load de-duplication.
+
+    Safe to share between threads and between MasterRAG instances.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 sizeof: Callable[[Any], int] = estimate_bytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._loading: Dict[Hashable, _Load] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        Only one thread runs the loader for a given key; others asking for
+        the same key meanwhile wait and receive its result. If the loader
+        raises, nothing is cached and every waiter gets the exception.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            load = self._loading.get(key)
+            owner = load is None
+            if owner:
+                load = self._loading[key] = _Load()
+                self.misses += 1
+            else:
+                self.waits += 1
+        if not owner:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.value
+
+        try:
+            load.value = loader()
+        except BaseException as e:
+            load.error = e
+            raise
+        else:
+            self.put(key, load.value)
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            load.done.set()
+        return load.value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, then evict until under max_bytes."""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key!r}: {size} bytes exceeds the cache size")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop one entry, if present."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/wait/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.waits
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'hit_rate': (self.hits + self.waits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_shared_cache: Optional[DocumentCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_document_cache() -> DocumentCache:
+    """Return the process-wide document cache."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = DocumentCache()
+    return _shared_cache
@@ -0,0 +1,216 @@
+"""
+Persistent, content-addressed cache for text embeddings.
+
+Vectors are stored as float32 blobs in a SQLite database keyed by
+(model, sha256(text)), so identical texts are embedded once across index
+builds, queries, Streamlit sessions and processes. The cache is bounded by
+total vector bytes and evicts least recently used entries.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.getenv(
+    "AORTAGPT_EMBEDDING_CACHE",
+    os.path.join(BASE_DIR, "data", "cache", "embeddings.sqlite")
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Writes between recounts of the stored bytes, which picks up other processes' writes
+RECOUNT_EVERY = 256
+
+
+def text_key(text: str) -> str:
+    """Cache key for a text: SHA-256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed LRU cache of embedding vectors.
+
+    Safe to share between threads; separate processes share the same file.
+    Cache errors are logged and treated as misses so that embedding never
+    fails because of the cache.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (model, key))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+            )
+        # Running total of stored vector bytes, so writes need not scan the table
+        self._bytes = self._count_bytes()
+        self._writes_since_count = 0
+
+    def _count_bytes(self) -> int:
+        """Total stored vector bytes, from a full table scan."""
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def _stored_bytes(self, model: str, keys: List[str]) -> int:
+        """Bytes currently stored for the given keys (lock held)."""
+        total = 0
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            total += self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+                f" WHERE model = ? AND key IN ({placeholders})",
+                [model] + batch
+            ).fetchone()[0]
+        return total
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors for texts; None for each miss."""
+        keys = [text_key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        try:
+            with self._lock, self._conn:
+                unique = list(dict.fromkeys(keys))
+                # Stay well below SQLite's bound-parameter limit
+                for i in range(0, len(unique), 500):
+                    batch = unique[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                        [model] + batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32).copy()
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND key = ?",
+                        [(now, model, key) for key in found]
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+        results = [found.get(key) for key in keys]
+        hits = sum(1 for r in results if r is not None)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Look up the vector for a single text."""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[np.ndarray]):
+        """Store vectors for texts, then evict if over the size bound."""
+        now = time.time()
+        by_key = {}
+        for text, vec in zip(texts, vectors):
+            if vec is None:
+                continue
+            vec = np.asarray(vec, dtype=np.float32)
+            key = text_key(text)
+            by_key[key] = (model, key, int(vec.shape[0]), vec.tobytes(), now)
+        if not by_key:
+            return
+        rows = list(by_key.values())
+        try:
+            with self._lock, self._conn:
+                replaced = self._stored_bytes(model, list(by_key))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, dim, vector, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._bytes += sum(len(row[3]) for row in rows) - replaced
+                self._writes_since_count += 1
+                if self._writes_since_count >= RECOUNT_EVERY:
+                    self._bytes = self._count_bytes()
+                    self._writes_since_count = 0
+                self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        """Store the vector for a single text."""
+        self.put_many(model, [text], [vector])
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes (lock held)."""
+        excess = self._bytes - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        freed = 0
+        for rowid, size in self._conn.execute(
+            "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_access"
+        ):
+            victims.append((rowid,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+        self._bytes -= freed
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and current size."""
+        entries, size = 0, 0
+        try:
+            with self._lock:
+                entries, size = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache stats failed: {e}")
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_disabled = False
+_default_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide cache, or None if it cannot be opened."""
+    global _default_cache, _default_disabled
+    if _default_cache is None and not _default_disabled:
+        with _default_lock:
+            if _default_cache is None and not _default_disabled:
+                try:
+                    _default_cache = EmbeddingCache()
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"Embedding cache disabled: {e}")
+                    _default_disabled = True
+    return _default_cache
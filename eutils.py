@@ -0,0 +1,173 @@
+"""
+Shared client for NCBI E-utilities (esearch, esummary, ...).
+
+All ClinVar traffic in the process goes through one pooled requests.Session
+(keep-alive, so calls after the first skip the TCP and TLS handshakes) and
+one token-bucket limiter, so concurrent Streamlit sessions and worker
+threads together stay within NCBI's limit of 3 requests per second, or 10
+with an API key. Throttled (429), 5xx and connection failures are retried
+with jittered exponential backoff, honouring Retry-After.
+
+Environment:
+  NCBI_API_KEY  raises the limit to 10 requests per second
+  NCBI_EMAIL    contact address sent with every request, as NCBI asks
+"""
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+TOOL_NAME = "AortaGPT"
+RATE_NO_KEY = 3.0
+RATE_WITH_KEY = 10.0
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+POOL_SIZE = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EutilsError(Exception):
+    """An E-utilities request failed after all retries."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """Hold back all callers for `seconds`, e.g. after a 429."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Delay before retry `attempt` (0-based): Retry-After if given, else full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt + 1)))
+
+
+class EutilsClient:
+    """Pooled, rate-limited, retrying E-utilities client. Safe to share between threads."""
+
+    def __init__(self, api_key: Optional[str] = None, email: Optional[str] = None,
+                 rate: Optional[float] = None, max_retries: int = MAX_RETRIES):
+        self.api_key = api_key
+        self.email = email
+        self.max_retries = max_retries
+        self.limiter = TokenBucket(rate or (RATE_WITH_KEY if api_key else RATE_NO_KEY))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.requests = 0
+        self.retries = 0
+
+    def url(self, endpoint: str) -> str:
+        """Full URL of an endpoint name such as 'esearch'."""
+        if endpoint.startswith("http"):
+            return endpoint
+        return f"{EUTILS_BASE_URL}{endpoint}.fcgi"
+
+    def call(self, endpoint: str, params: Dict[str, Any], method: str = "get",
+             max_retries: Optional[int] = None, timeout: float = 30) -> Dict[str, Any]:
+        """
+        Call an E-utilities endpoint and return its JSON response.
+
+        Args:
+            endpoint: Endpoint name ('esearch', 'esummary', ...) or full URL.
+            params: Query parameters; sent as form data when method is "post".
+            method: "get" or "post" (for long ID lists).
+            max_retries: Attempts in total (default: the client's).
+            timeout: Per-request timeout in seconds.
+        Returns:
+            The decoded JSON response.
+        Raises:
+            EutilsError: If every attempt failed.
+        """
+        params = dict(params)
+        params.setdefault("tool", TOOL_NAME)
+        if self.api_key:
+            params.setdefault("api_key", self.api_key)
+        if self.email:
+            params.setdefault("email", self.email)
+        url = self.url(endpoint)
+        attempts = max_retries or self.max_retries
+        last_error: Optional[Exception] = None
+        for attempt in range(attempts):
+            self.limiter.acquire()
+            self.requests += 1
+            retry_after = None
+            throttled = False
+            try:
+                if method == "post":
+                    response = self.session.post(url, data=params, timeout=timeout)
+                else:
+                    response = self.session.get(url, params=params, timeout=timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After")
+                throttled = response.status_code == 429
+                last_error = EutilsError(f"HTTP {response.status_code} from {url}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            except (requests.RequestException, ValueError) as e:
+                # Client errors and malformed JSON are not worth retrying
+                raise EutilsError(f"{url}: {e}") from e
+            if attempt + 1 < attempts:
+                delay = _backoff(attempt, retry_after)
+                self.retries += 1
+                logger.info(f"Retrying {endpoint} in {delay:.2f} s: {last_error}")
+                if throttled:
+                    # Every thread backs off, not just this one
+                    self.limiter.penalize(delay)
+                else:
+                    time.sleep(delay)
+        raise EutilsError(f"{url} failed after {attempts} attempts: {last_error}")
+
+
+_client: Optional[EutilsClient] = None
+_client_lock = threading.Lock()
+
+
+def get_eutils_client() -> EutilsClient:
+    """Return the process-wide E-utilities client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = EutilsClient(
+                    api_key=os.getenv("NCBI_API_KEY") or None,
+                    email=os.getenv("NCBI_EMAIL") or None,
+                )
+    return _client
@@ -2,9 +2,32 @@
 """
 Script to extract text from all PDF files in the data/raw folder
 and save them as .txt files in a sibling 'text' directory.
+
+Pages are extracted in parallel across a process pool and appended to the
+output file in page order as they finish. Next to each <name>.txt a
+<name>.pages.json map records the PDF's SHA-256 and the character offset at
+which each page starts; PDFs whose hash matches the map are skipped.
+
+Usage:
+  python extract_pdfs.py [--raw-dir data/raw] [--out-dir data/text]
+                         [--workers N] [--force]
 """
 import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 from pypdf import PdfReader
+from provenance import page_map_path, read_page_map
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+DEFAULT_TEXT_DIR = os.path.join(BASE_DIR, 'data', 'text')
+PAGE_SEPARATOR = "\n\n"
+# Pages per worker task: amortizes opening the PDF in each worker
+PAGES_PER_TASK = 8
+
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract text from a single PDF file."""
@@ -14,26 +37,159 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         page_text = page.extract_text() or ""
         text_chunks.append(page_text)
     # Join pages with double newline
-    return "\n\n".join(text_chunks)
+    return PAGE_SEPARATOR.join(text_chunks)
 
-def main():
-    # Define input and output directories
-    raw_dir = '/Users/aindukur/Documents/Projects/Personal/AortaGPT/data/raw'
-    data_dir = os.path.dirname(raw_dir)
-    out_dir = os.path.join(data_dir, 'text')
-    os.makedirs(out_dir, exist_ok=True)
 
-    # Process each PDF in the raw directory
-    for filename in os.listdir(raw_dir):
+def file_sha256(path: str) -> str:
+    """SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_pages(pdf_path: str, first: int, last: int) -> Tuple[str, int, List[str]]:
+    """Worker: extract pages [first, last) of a PDF."""
+    reader = PdfReader(pdf_path)
+    texts = []
+    for number in range(first, last):
+        try:
+            texts.append(reader.pages[number].extract_text() or "")
+        except Exception as e:
+            print(f"Warning: failed to extract page {number + 1} of {os.path.basename(pdf_path)}: {e}")
+            texts.append("")
+    return pdf_path, first, texts
+
+
+class _PageWriter:
+    """Writes one PDF's pages to disk in order as out-of-order batches arrive."""
+
+    def __init__(self, pdf_path: str, text_path: str, page_count: int, sha256: str):
+        self.pdf_path = pdf_path
+        self.text_path = text_path
+        self.page_count = page_count
+        self.sha256 = sha256
+        self.tmp_path = text_path + '.tmp'
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        self.pending: Dict[int, List[str]] = {}
+        self.next_page = 0
+        self.offset = 0
+        self.page_starts: List[int] = []
+
+    def add(self, first: int, texts: List[str]):
+        self.pending[first] = texts
+        while self.next_page in self.pending:
+            for text in self.pending.pop(self.next_page):
+                if self.next_page:
+                    self.file.write(PAGE_SEPARATOR)
+                    self.offset += len(PAGE_SEPARATOR)
+                self.page_starts.append(self.offset)
+                self.file.write(text)
+                self.offset += len(text)
+                self.next_page += 1
+
+    @property
+    def done(self) -> bool:
+        return self.next_page >= self.page_count
+
+    def finish(self):
+        """Publish the text file and its page map."""
+        self.file.close()
+        os.replace(self.tmp_path, self.text_path)
+        page_map = {
+            'source': os.path.basename(self.pdf_path),
+            'sha256': self.sha256,
+            'page_count': self.page_count,
+            'chars': self.offset,
+            'page_starts': self.page_starts,
+        }
+        tmp_map = page_map_path(self.text_path) + '.tmp'
+        with open(tmp_map, 'w', encoding='utf-8') as f:
+            json.dump(page_map, f)
+        os.replace(tmp_map, page_map_path(self.text_path))
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def extract_all(raw_dir: str = DEFAULT_RAW_DIR, out_dir: str = DEFAULT_TEXT_DIR,
+                workers: Optional[int] = None, force: bool = False) -> List[str]:
+    """
+    Extract every PDF in raw_dir to out_dir, skipping unchanged PDFs.
+
+    Args:
+        raw_dir: Directory containing .pdf files.
+        out_dir: Directory for .txt files and their page maps.
+        workers: Worker processes (default: all cores).
+        force: Re-extract PDFs even if their hash is unchanged.
+    Returns:
+        Names of the PDFs that were extracted.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    writers: Dict[str, _PageWriter] = {}
+    tasks = []
+    for filename in sorted(os.listdir(raw_dir)):
         if not filename.lower().endswith('.pdf'):
             continue
         pdf_path = os.path.join(raw_dir, filename)
-        txt = extract_text_from_pdf(pdf_path)
-        base_name = os.path.splitext(filename)[0]
-        out_path = os.path.join(out_dir, base_name + '.txt')
-        with open(out_path, 'w', encoding='utf-8') as f:
-            f.write(txt)
-        print(f"Extracted {filename} -> {os.path.basename(out_path)}")
+        text_path = os.path.join(out_dir, os.path.splitext(filename)[0] + '.txt')
+        sha256 = file_sha256(pdf_path)
+        page_map = read_page_map(text_path)
+        if (not force and page_map and page_map.get('sha256') == sha256
+                and os.path.exists(text_path)):
+            print(f"Unchanged: {filename}")
+            continue
+        try:
+            page_count = len(PdfReader(pdf_path).pages)
+        except Exception as e:
+            print(f"Warning: cannot read {filename}: {e}")
+            continue
+        writer = _PageWriter(pdf_path, text_path, page_count, sha256)
+        if page_count == 0:
+            writer.finish()
+            print(f"Extracted {filename} -> {os.path.basename(text_path)} (0 pages)")
+            continue
+        writers[pdf_path] = writer
+        tasks.extend(
+            (pdf_path, first, min(first + PAGES_PER_TASK, page_count))
+            for first in range(0, page_count, PAGES_PER_TASK)
+        )
+
+    if not tasks:
+        return []
+    extracted = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_pages, *task) for task in tasks]
+            for future in as_completed(futures):
+                pdf_path, first, texts = future.result()
+                writer = writers[pdf_path]
+                writer.add(first, texts)
+                if writer.done:
+                    writer.finish()
+                    del writers[pdf_path]
+                    extracted.append(os.path.basename(pdf_path))
+                    print(f"Extracted {os.path.basename(pdf_path)} -> "
+                          f"{os.path.basename(writer.text_path)} ({writer.page_count} pages)")
+    finally:
+        # Leave no partial output behind if extraction failed
+        for writer in writers.values():
+            writer.abort()
+    return extracted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract text from PDFs in parallel across a process pool")
+    parser.add_argument('--raw-dir', default=DEFAULT_RAW_DIR, help='Directory with .pdf files')
+    parser.add_argument('--out-dir', default=DEFAULT_TEXT_DIR, help='Output directory for .txt files')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--force', action='store_true', help='Re-extract unchanged PDFs')
+    args = parser.parse_args()
+    extract_all(args.raw_dir, args.out_dir, args.workers, args.force)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
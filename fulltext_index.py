@@ -0,0 +1,280 @@
+"""
+Persistent paragraph-level full-text index over the raw PDFs and extracted text.
+
+Paragraphs of every PDF in data/raw and every .txt file in data/text are
+stored in a SQLite FTS5 table, so term, phrase and prefix searches across the
+whole corpus are index lookups ranked by BM25 instead of scans over freshly
+parsed documents. The index lives on disk and is refreshed incrementally:
+files are re-indexed only when their content hash changes (the hash is only
+recomputed when a file's size or mtime changes).
+
+Query syntax:
+  plain words       all words must occur, e.g.  aortic root FBN1
+  "quoted phrase"   exact phrase, e.g.          "type A dissection"
+  prefix*           prefix match, e.g.          TGFBR*
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from pypdf import PdfReader
+from extract_pdfs import file_sha256
+from provenance import read_page_map
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.getenv(
+    "AORTAGPT_FULLTEXT_INDEX",
+    os.path.join(BASE_DIR, "data", "cache", "fulltext.sqlite")
+)
+DEFAULT_FOLDERS = (
+    os.path.join(BASE_DIR, "data", "raw"),
+    os.path.join(BASE_DIR, "data", "text"),
+)
+FILE_KINDS = {'.pdf': 'pdf', '.txt': 'text'}
+# Bumped when the tables change; older index files are rebuilt from scratch
+SCHEMA_VERSION = 2
+# Paragraphs longer than this are split at sentence-ending line breaks
+MAX_PARAGRAPH_CHARS = 2000
+
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r'\w+')
+
+
+def split_paragraphs(text: str, max_chars: int = MAX_PARAGRAPH_CHARS) -> List[str]:
+    """Split text on blank lines; long paragraphs are cut after sentence-ending lines."""
+    paragraphs = []
+    for block in re.split(r'\n\s*\n', text):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            paragraphs.append(block)
+            continue
+        current = []
+        size = 0
+        for line in block.split('\n'):
+            current.append(line)
+            size += len(line) + 1
+            if size >= max_chars and line.rstrip().endswith(('.', '!', '?', ':')):
+                paragraphs.append('\n'.join(current).strip())
+                current, size = [], 0
+        if current and '\n'.join(current).strip():
+            paragraphs.append('\n'.join(current).strip())
+    return paragraphs
+
+
+def _pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+def _text_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """Pages of an extracted text file, using its page map when there is one."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    page_map = read_page_map(path)
+    if not page_map or page_map.get('chars') != len(text):
+        yield 0, text
+        return
+    starts = list(page_map['page_starts']) + [len(text)]
+    for number, (start, end) in enumerate(zip(starts, starts[1:]), start=1):
+        yield number, text[start:end]
+
+
+def to_match_query(query: str) -> str:
+    """
+    Translate a user query into an FTS5 MATCH expression.
+
+    Quoted phrases stay phrases, words ending in '*' become prefix queries
+    and every other word must match; punctuation inside a word (e.g.
+    "p.Arg179His") turns it into a phrase of its parts.
+    """
+    terms = []
+    for phrase, word in _QUERY_TOKEN_RE.findall(query):
+        if phrase:
+            parts = _WORD_RE.findall(phrase)
+            if parts:
+                terms.append('"' + ' '.join(parts) + '"')
+            continue
+        prefix = word.endswith('*')
+        parts = _WORD_RE.findall(word)
+        if not parts:
+            continue
+        if len(parts) == 1:
+            terms.append(f'"{parts[0]}"' + ('*' if prefix else ''))
+        else:
+            terms.append('"' + ' '.join(parts) + '"' + ('*' if prefix else ''))
+    return ' AND '.join(terms)
+
+
+class FullTextIndex:
+    """
+    SQLite FTS5 index of corpus paragraphs, kept current by file hash.
+
+    Files and paragraphs are keyed by (folder, file name), so instances over
+    different folders can share one index file; each refreshes and searches
+    only its own folders. Safe to share between threads; separate processes
+    share the same file.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, folders: Sequence[str] = DEFAULT_FOLDERS):
+        self.path = path
+        self.folders = list(folders)
+        self._abs_folders = [os.path.abspath(folder) for folder in self.folders]
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # Indexes keyed by bare file name; they are only a cache, so start over
+                self._conn.execute("DROP TABLE IF EXISTS files")
+                self._conn.execute("DROP TABLE IF EXISTS paragraphs")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " folder TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " sha256 TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " paragraphs INTEGER NOT NULL,"
+                " indexed_at REAL NOT NULL,"
+                " PRIMARY KEY (folder, name))"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5("
+                " text, source UNINDEXED, kind UNINDEXED, page UNINDEXED, folder UNINDEXED,"
+                " tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Bring the index in line with the files on disk.
+
+        Only files under this instance's folders are added or removed.
+
+        Returns:
+            Counts of 'indexed', 'unchanged' and 'removed' files.
+        """
+        counts = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        present = set()
+        folders = self._abs_folders
+        with self._lock:
+            known = {
+                (folder, name): (sha256, size, mtime_ns)
+                for folder, name, sha256, size, mtime_ns in self._conn.execute(
+                    "SELECT folder, name, sha256, size, mtime_ns FROM files"
+                    f" WHERE folder IN ({','.join('?' * len(folders))})",
+                    folders
+                )
+            }
+            for folder in folders:
+                if not os.path.isdir(folder):
+                    continue
+                for fname in sorted(os.listdir(folder)):
+                    kind = FILE_KINDS.get(os.path.splitext(fname)[1].lower())
+                    if kind is None:
+                        continue
+                    present.add((folder, fname))
+                    path = os.path.join(folder, fname)
+                    st = os.stat(path)
+                    previous = known.get((folder, fname))
+                    if previous and previous[1:] == (st.st_size, st.st_mtime_ns):
+                        counts['unchanged'] += 1
+                        continue
+                    sha256 = file_sha256(path)
+                    if previous and previous[0] == sha256:
+                        with self._conn:
+                            self._conn.execute(
+                                "UPDATE files SET size = ?, mtime_ns = ? WHERE folder = ? AND name = ?",
+                                (st.st_size, st.st_mtime_ns, folder, fname)
+                            )
+                        counts['unchanged'] += 1
+                        continue
+                    self._index_file(path, folder, fname, kind, sha256, st)
+                    counts['indexed'] += 1
+            for folder, fname in set(known) - present:
+                with self._conn:
+                    self._conn.execute("DELETE FROM paragraphs WHERE folder = ? AND source = ?", (folder, fname))
+                    self._conn.execute("DELETE FROM files WHERE folder = ? AND name = ?", (folder, fname))
+                counts['removed'] += 1
+        if counts['indexed'] or counts['removed']:
+            logger.info(f"Full-text index refreshed: {counts}")
+        return counts
+
+    def _index_file(self, path: str, folder: str, fname: str, kind: str, sha256: str, st: os.stat_result):
+        """Replace one file's paragraphs (lock held)."""
+        start = time.perf_counter()
+        pages = _pdf_pages(path) if kind == 'pdf' else _text_pages(path)
+        rows = []
+        try:
+            for page, text in pages:
+                rows.extend((para, fname, kind, page or None, folder) for para in split_paragraphs(text))
+        except Exception as e:
+            logger.error(f"Error reading {fname} for full-text index: {e}")
+            return
+        with self._conn:
+            self._conn.execute("DELETE FROM paragraphs WHERE folder = ? AND source = ?", (folder, fname))
+            self._conn.executemany(
+                "INSERT INTO paragraphs (text, source, kind, page, folder) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files"
+                " (folder, name, kind, sha256, size, mtime_ns, paragraphs, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (folder, fname, kind, sha256, st.st_size, st.st_mtime_ns, len(rows), time.time())
+            )
+        logger.info(f"Indexed {fname}: {len(rows)} paragraphs in {time.perf_counter() - start:.2f} s")
+
+    def search(self, query: str, max_results: int = 10, sources: Optional[Sequence[str]] = None,
+               kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Rank paragraphs of this instance's folders matching the query by BM25.
+
+        Args:
+            query: Words, "quoted phrases" and prefix* terms (see module docs).
+            max_results: Maximum number of paragraphs to return.
+            sources: Restrict to these file names.
+            kind: Restrict to 'pdf' or 'text' files.
+        Returns:
+            Dicts with 'source', 'kind', 'page' (None if unknown), 'text'
+            and 'score' (higher is better), best first.
+        """
+        match = to_match_query(query)
+        if not match:
+            return []
+        sql = ("SELECT source, kind, page, text, bm25(paragraphs) FROM paragraphs WHERE paragraphs MATCH ?"
+               f" AND folder IN ({','.join('?' * len(self._abs_folders))})")
+        params: List[Any] = [match] + self._abs_folders
+        if sources:
+            sql += f" AND source IN ({','.join('?' * len(sources))})"
+            params.extend(sources)
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY bm25(paragraphs) LIMIT ?"
+        params.append(max_results)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {'source': source, 'kind': kind_, 'page': page, 'text': text, 'score': -score}
+            for source, kind_, page, text, score in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return indexed file and paragraph counts for this instance's folders."""
+        with self._lock:
+            files, paragraphs = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(paragraphs), 0) FROM files"
+                f" WHERE folder IN ({','.join('?' * len(self._abs_folders))})",
+                self._abs_folders
+            ).fetchone()
+        return {'path': self.path, 'files': files, 'paragraphs': paragraphs}
@@ -1,96 +1,205 @@
 #!/usr/bin/env python3
 """
 Generate embeddings for all .txt documents in the data/text folder.
-Saves results as JSON and CSV in the data folder.
+Saves results as a binary index directory (see index_format.py) in data/index,
+re-embedding only chunks that changed since the last build.
 """
 import os
+import time
 import openai
-import pandas as pd
 import numpy as np
-import json
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from embedding_cache import get_embedding_cache
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based token estimate
+    tiktoken = None
 
 # Load environment variables from .env file
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def generate_embedding(text: str) -> np.ndarray:
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Per-request limits for batched embedding calls (API caps at 300k tokens / 2048 inputs)
+MAX_BATCH_TOKENS = 250000
+MAX_BATCH_ITEMS = 2048
+
+_encoding = None
+_deadline_client = None
+
+def _embeddings_api(timeout: Optional[float] = None):
+    """
+    The embeddings endpoint to call. With a timeout it is served by a client
+    that never retries, so the timeout bounds the whole call rather than each
+    of the default client's attempts.
+    """
+    global _deadline_client
+    if timeout is None:
+        return openai.embeddings
+    if _deadline_client is None:
+        _deadline_client = openai.OpenAI(api_key=openai.api_key, max_retries=0)
+    return _deadline_client.with_options(timeout=timeout).embeddings
+
+def generate_embedding(text: str, timeout: Optional[float] = None) -> np.ndarray:
     """
     Generate embedding for a given text string.
 
+    Vectors are served from the persistent embedding cache when the same
+    text has been embedded before with the same model.
+
     Args:
         text: Text to generate embedding for.
+        timeout: Optional deadline in seconds for the API call (not retried).
     Returns:
-        Embedding vector as numpy array.
+        Embedding vector as float32 numpy array.
     """
-    response = openai.embeddings.create(
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+    response = _embeddings_api(timeout).create(
         input=text,
-        model="text-embedding-3-small"
+        model=EMBEDDING_MODEL
     )
-    return np.array(response.data[0].embedding)
- 
-def chunk_text(text: str, max_chars: int = 5000, overlap: int = 500) -> list:
+    vector = np.array(response.data[0].embedding, dtype=np.float32)
+    if cache is not None:
+        cache.put(EMBEDDING_MODEL, text, vector)
+    return vector
+
+def estimate_tokens(text: str) -> int:
     """
-    Split text into overlapping chunks not exceeding max_chars characters.
+    Estimate the number of tokens the embedding model will see for text.
+    """
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # Encoding files unavailable (e.g. offline); use the estimate
+                pass
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def plan_batches(texts: List[str], max_tokens: int = MAX_BATCH_TOKENS,
+                 max_items: int = MAX_BATCH_ITEMS) -> List[List[int]]:
+    """
+    Group text indices into request-sized batches, preserving order.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _embed_batch(texts: List[str], max_retries: int,
+                 timeout: Optional[float] = None) -> List[Optional[np.ndarray]]:
+    """
+    Embed one batch; on a rejected input, bisect so only failing items are retried.
     """
-    chunks = []
+    for attempt in range(max_retries):
+        try:
+            response = _embeddings_api(timeout).create(input=texts, model=EMBEDDING_MODEL)
+            data = sorted(response.data, key=lambda d: d.index)
+            return [np.array(d.embedding, dtype=np.float32) for d in data]
+        except openai.BadRequestError as e:
+            # The request itself is invalid: isolate the offending input(s)
+            if len(texts) == 1:
+                print(f"Failed to embed input: {e}")
+                return [None]
+            mid = len(texts) // 2
+            return (_embed_batch(texts[:mid], max_retries, timeout)
+                    + _embed_batch(texts[mid:], max_retries, timeout))
+        except Exception as e:
+            if attempt == max_retries - 1:
+                print(f"Failed to embed batch of {len(texts)} inputs: {e}")
+                return [None] * len(texts)
+            time.sleep(2 ** attempt)  # Exponential backoff
+    return [None] * len(texts)
+
+def generate_embeddings_batch(texts: List[str], max_tokens: int = MAX_BATCH_TOKENS,
+                              max_items: int = MAX_BATCH_ITEMS,
+                              max_retries: int = 3,
+                              timeout: Optional[float] = None) -> List[Optional[np.ndarray]]:
+    """
+    Generate embeddings for many texts, packing them into few API requests.
+
+    Args:
+        texts: Texts to embed.
+        max_tokens: Estimated token budget per request.
+        max_items: Maximum number of inputs per request.
+        max_retries: Attempts per batch for transient errors.
+        timeout: Optional deadline in seconds per request attempt; the
+            client does not retry on its own when it is set.
+    Returns:
+        One embedding per input, in input order; None for inputs that failed.
+        Inputs found in the embedding cache are not sent to the API.
+    """
+    results: List[Optional[np.ndarray]] = [None] * len(texts)
+    cache = get_embedding_cache()
+    if cache is not None:
+        results = cache.get_many(EMBEDDING_MODEL, texts)
+    # Identical texts are sent once and fanned back out to every position
+    missing: Dict[str, List[int]] = {}
+    for i, vec in enumerate(results):
+        if vec is None:
+            missing.setdefault(texts[i], []).append(i)
+    missing_texts = list(missing)
+    for batch in plan_batches(missing_texts, max_tokens, max_items):
+        batch_texts = [missing_texts[j] for j in batch]
+        vectors = _embed_batch(batch_texts, max_retries, timeout)
+        for text, vec in zip(batch_texts, vectors):
+            for i in missing[text]:
+                results[i] = vec
+        if cache is not None:
+            cache.put_many(EMBEDDING_MODEL, batch_texts, vectors)
+    return results
+
+def chunk_spans(text: str, max_chars: int = 5000, overlap: int = 500) -> list:
+    """
+    Compute (start, end) character offsets of overlapping chunks of text.
+
+    Fixed-size splitter; index builds use the structure-aware chunker.py.
+    """
+    spans = []
     start = 0
     length = len(text)
     while start < length:
         end = min(start + max_chars, length)
-        chunks.append(text[start:end])
+        spans.append((start, end))
         # Move start forward, keep overlap
         start = end - overlap if end < length else length
-    return chunks
+    return spans
+
+def chunk_text(text: str, max_chars: int = 5000, overlap: int = 500) -> list:
+    """
+    Split text into overlapping chunks not exceeding max_chars characters.
+    """
+    return [text[start:end] for start, end in chunk_spans(text, max_chars, overlap)]
 
 def main():
     # Locate text files directory relative to script
     base_dir = os.path.dirname(os.path.abspath(__file__))
     text_dir = os.path.join(base_dir, "data", "text")
-    output_dir = os.path.join(base_dir, "data")
-    os.makedirs(output_dir, exist_ok=True)
-
-    records = []
-    # Iterate through all .txt files
-    for fname in os.listdir(text_dir):
-        if not fname.lower().endswith('.txt'):
-            continue
-        path = os.path.join(text_dir, fname)
-        with open(path, 'r', encoding='utf-8') as f:
-            text = f.read()
-        print(f"Embedding: {fname}")
-        # Chunk long texts to respect token limits
-        texts = chunk_text(text)
-        embs = []
-        for idx, chunk in enumerate(texts):
-            try:
-                emb = generate_embedding(chunk)
-                embs.append(emb)
-            except Exception as e:
-                print(f"Failed chunk {idx} of {fname}: {e}")
-        if not embs:
-            print(f"No embeddings generated for {fname}, skipping.")
-            continue
-        # Average embeddings to get document-level vector
-        doc_emb = np.mean(embs, axis=0)
-        records.append({
-            'file': fname,
-            'embedding': doc_emb.tolist()
-        })
-
-    # Save as JSON
-    json_path = os.path.join(output_dir, 'embeddings.json')
-    with open(json_path, 'w', encoding='utf-8') as jf:
-        json.dump(records, jf, indent=2)
-    print(f"Saved JSON embeddings to {json_path}")
-
-    # Save as CSV (embedding column as JSON string)
-    df = pd.DataFrame(records)
-    csv_path = os.path.join(output_dir, 'embeddings.csv')
-    # Serialize embedding lists as JSON strings for CSV
-    df['embedding'] = df['embedding'].apply(json.dumps)
-    df.to_csv(csv_path, index=False)
-    print(f"Saved CSV embeddings to {csv_path}")
+    output_dir = os.path.join(base_dir, "data", "index")
+
+    # Imported here: vector_store depends on this module
+    from vector_store import build_index
+    build_index(text_dir, output_dir)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,21 @@
 import streamlit as st
-import requests
 import json
+import logging
 import matplotlib.pyplot as plt
 import numpy as np
 import time
+import functools
+import threading
 import concurrent.futures
 from datetime import datetime
+from clinvar_cache import cached_clinvar, in_background_refresh
+from clinvar_store import get_variant_store
+from eutils import EutilsError, get_eutils_client
+from hgvs_normalize import clinvar_term, normalize_gene, variant_key
+from variant_index import VariantIndex
 
 
+logger = logging.getLogger(__name__)
 
 system_prompt = '''
 You are AortaGPT, an advanced clinical decision support tool for Heritable Thoracic Aortic Disease (HTAD). Your purpose is to provide evidence-based, clinically detailed recommendations structured into specific sections, with precise citations to approved sources only. 
@@ -101,187 +109,350 @@ For surgical recommendations, specify:
 	4. ALWAYS explain the reasoning behind recommendations, especially when different from standard care 		5. Include a REFERENCES section at the end listing all cited sources Your recommendations should be so specific and detailed that a clinician could immediately implement them without needing further information or clarification.
 
 '''
+# esummary accepts many IDs per request; POST keeps long ID lists out of the URL
+ESUMMARY_BATCH_SIZE = 200
+ESUMMARY_MAX_WORKERS = 2
+# Variants per ClinVar page; further pages are summarized from the esearch history server
+VARIANT_PAGE_SIZE = 500
+# NCBI keeps WebEnv histories for a limited time; renew well before they expire
+WEBENV_TTL = 1800
+# Matches shown in the variant picker per keystroke
+VARIANT_PICKER_LIMIT = 50
+CUSTOM_VARIANT_OPTION = "Enter custom variant"
+
+_variant_histories = {}
+_variant_histories_lock = threading.Lock()
+# Gene -> {variant title or canonical key: compact record} of every variant list loaded in this process
+_variant_records = {}
+_variant_records_lock = threading.Lock()
+
 # Improved API functions
-def rate_limited_api_call(url, params, max_retries=3):
-    """Make API calls with exponential backoff"""
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            
-            # Handle rate limiting
-            if response.status_code == 429:
-                time.sleep(2 ** attempt)  # Exponential backoff
-                continue
-                
-            response.raise_for_status()
-            return response.json()
-            
-        except Exception as e:
-            if attempt == max_retries - 1:
-                st.warning(f"API call failed: {str(e)}")
-                return None
-            time.sleep(1)
-    
-    return None
+def rate_limited_api_call(endpoint, params, max_retries=3, method="get", quiet=False):
+    """
+    Call an E-utilities endpoint ("esearch", "esummary" or a full URL) through the shared rate-limited client.
+
+    Failures are shown with st.warning, or only logged when quiet is set or on
+    a background cache refresh; Streamlit calls need the script thread.
+    """
+    try:
+        return get_eutils_client().call(endpoint, params, method=method, max_retries=max_retries)
+    except EutilsError as e:
+        if quiet or in_background_refresh():
+            logger.warning(f"API call failed: {e}")
+        else:
+            st.warning(f"API call failed: {str(e)}")
+        return None
 
 def fetch_clinvar_variants(gene_symbol):
-    """Fetch variants for a given gene from ClinVar API with parallel processing"""
+    """Fetch P/LP variant titles for a gene from the offline store, else ClinVar through the persistent cache"""
+    store = get_variant_store()
+    if store is not None and store.covers(gene_symbol):
+        return store.variant_names(gene_symbol) + [CUSTOM_VARIANT_OPTION]
     try:
-        # Check cache first
-        cache_key = f"variants_{gene_symbol}"
-        if cache_key in st.session_state.variant_cache:
-            return st.session_state.variant_cache[cache_key]
-        
-        # NCBI E-utilities API endpoint
-        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        
-        # Build query
-        query = f"{gene_symbol}[gene] AND (\"pathogenic\"[clinical_significance] OR \"likely pathogenic\"[clinical_significance])"
-        
-        # Request parameters
-        params = {
-            "db": "clinvar",
-            "term": query,
-            "retmode": "json",
-            "retmax": 500
-        }
-        
-        # Make the request
-        response = rate_limited_api_call(base_url, params)
-        if not response:
-            return []
-            
-        # Get list of variant IDs
-        id_list = response.get('esearchresult', {}).get('idlist', [])
-        
-        if not id_list:
-            return []
-            
-        # Fetch details for variants in parallel
-        variants = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for variant_id in id_list:
-                futures.append(
-                    executor.submit(fetch_variant_name, variant_id)
-                )
-            
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result:
-                    variants.append(result)
-        
-        # Add custom option
-        variants.append("Enter custom variant")
-        
-        # Cache results
-        st.session_state.variant_cache[cache_key] = variants
-        return variants
-        
+        records = cached_clinvar("variant_records", gene_symbol, lambda: _load_clinvar_variants(gene_symbol))
     except Exception as e:
         st.warning(f"Error fetching variants: {str(e)}")
         return []
+    if records is None:
+        return []
+    _remember_variant_records(gene_symbol, records)
+    return [record["title"] for record in records] + [CUSTOM_VARIANT_OPTION]
 
-def fetch_variant_name(variant_id):
-    """Helper function to fetch a single variant name"""
-    try:
-        summary_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-        summary_params = {
-            "db": "clinvar",
-            "id": variant_id,
-            "retmode": "json"
-        }
-        
-        summary_response = rate_limited_api_call(summary_url, summary_params)
-        if not summary_response:
+def compact_variant_record(variant_id, summary):
+    """The parts of an esummary record the app uses: ID, title, significance, review status, update date"""
+    # Current esummary nests the classification; older responses had clinical_significance
+    classification = summary.get('germline_classification') or summary.get('clinical_significance') or {}
+    if not isinstance(classification, dict):
+        classification = {"description": classification}
+    return {
+        "variant_id": str(variant_id),
+        "title": summary.get('title', ''),
+        "clinical_significance": classification.get('description') or 'Not available',
+        "review_status": classification.get('review_status') or summary.get('review_status') or 'Not available',
+        "last_updated": classification.get('last_evaluated') or summary.get('update_date') or 'Not available'
+    }
+
+def _remember_variant_records(gene_symbol, records):
+    """
+    Add loaded records to the gene-keyed store used when a variant is selected.
+
+    Newer records replace older ones with the same title, so refreshed
+    classifications take effect; a canonical key keeps the first record
+    filed under it unless it still points at a replaced one.
+    """
+    keyed = [(record, variant_key(gene_symbol, record["title"])) for record in records]
+    with _variant_records_lock:
+        by_name = _variant_records.setdefault(normalize_gene(gene_symbol), {})
+        for record, key in keyed:
+            previous = by_name.get(record["title"])
+            by_name[record["title"]] = record
+            if key not in by_name or by_name[key] is previous:
+                by_name[key] = record
+
+def _variant_details_from_record(record):
+    """fetch_variant_details' result for a compact record"""
+    return {
+        "clinical_significance": record["clinical_significance"],
+        "review_status": record["review_status"],
+        "last_updated": record["last_updated"],
+        "variant_id": record["variant_id"],
+        "sources": [],
+        "clinvar_url": f"https://www.ncbi.nlm.nih.gov/clinvar/variation/{record['variant_id']}/"
+    }
+
+def lookup_variant_record(variant_name, gene_symbol=None):
+    """
+    Compact record of a variant from the loaded lists; None if not loaded.
+
+    Matches the exact title first, then any spelling of the same change
+    (see hgvs_normalize), in the gene's list or, without a gene, in any list.
+    """
+    with _variant_records_lock:
+        if gene_symbol:
+            genes = [normalize_gene(gene_symbol)]
+        else:
+            genes = list(_variant_records)
+        for gene in genes:
+            by_name = _variant_records.get(gene, {})
+            for name in (variant_name, variant_key(gene, variant_name)):
+                if name in by_name:
+                    return by_name[name]
+    return None
+
+def _variant_query(gene_symbol):
+    """ClinVar query for a gene's pathogenic and likely pathogenic variants"""
+    return f"{gene_symbol}[gene] AND (\"pathogenic\"[clinical_significance] OR \"likely pathogenic\"[clinical_significance])"
+
+def _esearch_variants(gene_symbol, retmax):
+    """Run the variant esearch on the history server and remember its WebEnv; None if the API failed"""
+    params = {
+        "db": "clinvar",
+        "term": _variant_query(gene_symbol),
+        "retmode": "json",
+        "retmax": retmax,
+        "usehistory": "y"
+    }
+    response = rate_limited_api_call("esearch", params)
+    if not response:
+        return None
+    result = response.get('esearchresult', {})
+    if result.get('webenv'):
+        with _variant_histories_lock:
+            _variant_histories[gene_symbol.upper()] = {
+                "count": int(result.get('count', 0)),
+                "webenv": result['webenv'],
+                "query_key": result.get('querykey', '1'),
+                "created": time.time()
+            }
+    return result
+
+def _variant_history(gene_symbol, renew=False):
+    """The gene's esearch history (count, WebEnv, query_key), renewed when old; None if the API failed"""
+    with _variant_histories_lock:
+        history = _variant_histories.get(gene_symbol.upper())
+    if renew or history is None or time.time() - history["created"] > WEBENV_TTL:
+        if _esearch_variants(gene_symbol, 0) is None:
             return None
-            
-        result = summary_response.get('result', {})
-        if variant_id in result:
-            variant_info = result[variant_id]
-            variant_name = variant_info.get('title', '')
-            if variant_name:
-                return variant_name
-        
+        with _variant_histories_lock:
+            history = _variant_histories.get(gene_symbol.upper())
+    return history
+
+def _load_clinvar_variants(gene_symbol):
+    """Query ClinVar for the first page of a gene's compact variant records; None if the API failed"""
+    response = _esearch_variants(gene_symbol, VARIANT_PAGE_SIZE)
+    if response is None:
         return None
-    except Exception:
+
+    # Get list of variant IDs
+    id_list = response.get('idlist', [])
+
+    if not id_list:
+        return []
+
+    # Fetch summaries in batches, keeping esearch order
+    summaries = fetch_variant_summaries(id_list)
+    if not summaries:
         return None
+    records = [compact_variant_record(variant_id, summaries[variant_id])
+               for variant_id in id_list if variant_id in summaries]
+    return [record for record in records if record["title"]]
 
-def fetch_variant_details(variant_name):
-    """Fetch detailed information about a specific variant"""
+def fetch_variant_count(gene_symbol):
+    """Total P/LP variants for a gene (offline store or ClinVar); None if unknown"""
+    store = get_variant_store()
+    if store is not None and store.covers(gene_symbol):
+        return len(store.variant_names(gene_symbol))
+    history = _variant_history(gene_symbol)
+    return history["count"] if history else None
+
+def fetch_more_variants(gene_symbol, page, loaded=()):
+    """
+    Variant titles of page `page` (1-based after the first page fetch_clinvar_variants returns)
+    that are not already in `loaded`; None if the page could not be fetched.
+
+    Pages are cached separately and come from the current esearch history, so
+    ClinVar changes between pages can shift records across page boundaries;
+    titles already listed are dropped rather than shown twice.
+    """
     try:
-        # Check cache
-        cache_key = f"details_{variant_name}"
-        if cache_key in st.session_state.variant_cache:
-            return st.session_state.variant_cache[cache_key]
-            
-        # Search for variant
-        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        params = {
-            "db": "clinvar",
-            "term": variant_name,
-            "retmode": "json",
-            "retmax": 1
-        }
-        
-        response = rate_limited_api_call(base_url, params)
-        if not response:
-            return None
-            
-        id_list = response.get('esearchresult', {}).get('idlist', [])
-        
-        if not id_list:
+        records = cached_clinvar("variant_record_page", f"{gene_symbol} {page}",
+                                 lambda: _load_variant_page(gene_symbol, page))
+    except Exception as e:
+        st.warning(f"Error fetching more variants: {str(e)}")
+        return None
+    if records is None:
+        return None
+    _remember_variant_records(gene_symbol, records)
+    seen = set(loaded)
+    titles = []
+    for record in records:
+        if record["title"] not in seen:
+            seen.add(record["title"])
+            titles.append(record["title"])
+    return titles
+
+def _load_variant_page(gene_symbol, page):
+    """Summarize one page of the gene's esearch results from its WebEnv; None if the API failed"""
+    history = _variant_history(gene_symbol)
+    for attempt in range(2):
+        if history is None:
             return None
-            
-        # Get details
-        variant_id = id_list[0]
-        summary_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
+        first = page * VARIANT_PAGE_SIZE
+        last = min(history["count"], first + VARIANT_PAGE_SIZE)
+        records = []
+        for retstart in range(first, last, ESUMMARY_BATCH_SIZE):
+            response = rate_limited_api_call("esummary", {
+                "db": "clinvar",
+                "query_key": history["query_key"],
+                "WebEnv": history["webenv"],
+                "retstart": retstart,
+                "retmax": min(ESUMMARY_BATCH_SIZE, last - retstart),
+                "retmode": "json"
+            })
+            result = (response or {}).get('result')
+            if result is None:
+                break
+            records.extend(compact_variant_record(uid, result[uid]) for uid in result.get('uids', []) if uid in result)
+        else:
+            return [record for record in records if record["title"]]
+        # The WebEnv may have expired on NCBI's side: renew it once
+        history = _variant_history(gene_symbol, renew=True) if attempt == 0 else None
+    return None
+
+def fetch_variant_summaries(id_list, batch_size=ESUMMARY_BATCH_SIZE, max_workers=ESUMMARY_MAX_WORKERS):
+    """
+    Fetch esummary records for ClinVar IDs, batch_size IDs per POST request.
+
+    Batches run on at most max_workers threads, which only log failures;
+    one warning is shown afterwards on the calling thread. Returns a dict of
+    ID -> esummary record; IDs from failed batches are missing.
+    """
+    batches = [id_list[i:i + batch_size] for i in range(0, len(id_list), batch_size)]
+
+    def fetch_batch(batch):
         summary_params = {
             "db": "clinvar",
-            "id": variant_id,
+            "id": ",".join(batch),
             "retmode": "json"
         }
-        
-        summary_response = rate_limited_api_call(summary_url, summary_params)
+        summary_response = rate_limited_api_call("esummary", summary_params, method="post", quiet=True)
         if not summary_response:
             return None
-            
-        # Extract information
         result = summary_response.get('result', {})
-        if variant_id in result:
-            variant_info = result[variant_id]
-            
-            details = {
-                "clinical_significance": variant_info.get('clinical_significance', 'Not available'),
-                "review_status": variant_info.get('review_status', 'Not available'),
-                "last_updated": variant_info.get('update_date', 'Not available'),
-                "variant_id": variant_id,
-                "sources": [],
-                "clinvar_url": f"https://www.ncbi.nlm.nih.gov/clinvar/variation/{variant_id}/"
-            }
-            
-            # Cache results
-            st.session_state.variant_cache[cache_key] = details
+        return {uid: result[uid] for uid in result.get('uids', batch) if uid in result}
+
+    summaries = {}
+    failed = 0
+    if len(batches) == 1:
+        results = [fetch_batch(batches[0])]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch_batch, batches))
+    for records in results:
+        if records is None:
+            failed += 1
+        else:
+            summaries.update(records)
+    if failed and not in_background_refresh():
+        st.warning(f"API call failed: {failed} of {len(batches)} ClinVar summary requests did not complete")
+    return summaries
+
+def fetch_variant_details(variant_name, gene_symbol=None):
+    """
+    Fetch detailed information about a specific variant.
+
+    Variants from a loaded variant list are answered from their compact
+    records and variants in the offline store from the store, both without
+    network requests; anything else is looked up in ClinVar through the
+    persistent cache.
+    """
+    record = lookup_variant_record(variant_name, gene_symbol)
+    if record is not None:
+        return _variant_details_from_record(record)
+    store = get_variant_store()
+    if store is not None:
+        details = store.details(variant_name, gene_symbol)
+        if details is not None:
             return details
-        
-        return None
-        
+    try:
+        return cached_clinvar("details", variant_key(gene_symbol, variant_name),
+                              lambda: _load_variant_details(variant_name, gene_symbol))
     except Exception as e:
         st.warning(f"Error fetching variant details: {str(e)}")
         return None
 
-def filter_variants(variants, query):
-    """Filter variants based on search query"""
-    if not query:
-        return variants
-    
-    query = query.lower()
-    filtered = [v for v in variants if query in v.lower()]
-    
+def _load_variant_details(variant_name, gene_symbol=None):
+    """
+    Search ClinVar for a variant within its gene and summarize its first hit;
+    None if not found or the API failed
+    """
+    # Search for variant, restricted to the gene so a bare "R179H" cannot match another gene
+    params = {
+        "db": "clinvar",
+        "term": clinvar_term(gene_symbol, variant_name),
+        "retmode": "json",
+        "retmax": 1
+    }
+
+    response = rate_limited_api_call("esearch", params)
+    if not response:
+        return None
+
+    id_list = response.get('esearchresult', {}).get('idlist', [])
+
+    if not id_list:
+        return None
+
+    # Get details
+    variant_id = id_list[0]
+    summary_params = {
+        "db": "clinvar",
+        "id": variant_id,
+        "retmode": "json"
+    }
+
+    summary_response = rate_limited_api_call("esummary", summary_params)
+    if not summary_response:
+        return None
+
+    # Extract information
+    result = summary_response.get('result', {})
+    if variant_id not in result:
+        return None
+    return _variant_details_from_record(compact_variant_record(variant_id, result[variant_id]))
+
+@functools.lru_cache(maxsize=32)
+def _variant_index(names):
+    """Search index over a tuple of variant names, built once per list"""
+    return VariantIndex(names)
+
+def filter_variants(variants, query, limit=VARIANT_PICKER_LIMIT):
+    """Top `limit` variants matching a search query (HGVS c./p. names, one-letter protein changes, substrings)"""
+    names = tuple(v for v in variants if v != CUSTOM_VARIANT_OPTION)
+    filtered = _variant_index(names).search(query or "", limit)
+
     # Always include custom option
-    if "Enter custom variant" not in filtered:
-        filtered.append("Enter custom variant")
-        
+    filtered.append(CUSTOM_VARIANT_OPTION)
     return filtered
   
 def build_patient_context(session_state, clinical_options) -> str:
@@ -0,0 +1,137 @@
+"""
+Canonical keys for gene + variant notations.
+
+The same variant reaches the app as "p.Arg179His", "R179H", "p.(Arg179His)",
+"c.536G>A", "c.536 g>a" or a full ClinVar title such as
+"NM_001613.4(ACTA2):c.536G>A (p.Arg179His)". This module reduces each
+spelling to canonical HGVS parts, so that ClinVar caches and lookups share
+one key per variant:
+
+  c. changes   "c." + bases upper-cased, edit keywords (del, ins, dup, inv)
+               lower-cased, whitespace removed:        c.536G>A
+  p. changes   one-letter residues, stop as "*", no predicted-change
+               parentheses:                            p.R179H, p.R2180*
+
+Transcript prefixes are dropped; gene symbols are upper-cased.
+
+A variant is keyed on its c. change when it has one and on its p. change
+only when that is all it carries. Different c. changes can cause the same
+p. change (e.g. c.3037delG and c.3038_3039del both give p.Gly1013fs), so a
+p. key never stands in for a c. change: "R179H" and
+"NM_001613.4(ACTA2):c.536G>A (p.Arg179His)" have separate keys.
+"""
+import re
+from typing import NamedTuple, Optional
+
+# Three-letter to one-letter amino acid codes
+AMINO_ACIDS = {
+    'Ala': 'A', 'Arg': 'R', 'Asn': 'N', 'Asp': 'D', 'Cys': 'C', 'Gln': 'Q', 'Glu': 'E',
+    'Gly': 'G', 'His': 'H', 'Ile': 'I', 'Leu': 'L', 'Lys': 'K', 'Met': 'M', 'Phe': 'F',
+    'Pro': 'P', 'Ser': 'S', 'Thr': 'T', 'Trp': 'W', 'Tyr': 'Y', 'Val': 'V', 'Ter': '*',
+    'Sec': 'U', 'Pyl': 'O',
+}
+
+_THREE_LETTER = {one: three for three, one in AMINO_ACIDS.items()}
+_THREE_LETTER_RE = re.compile('|'.join(AMINO_ACIDS), re.IGNORECASE)
+_ONE_LETTER = 'ACDEFGHIKLMNPQRSTVWYUO'
+_AA3 = '(?:' + '|'.join(AMINO_ACIDS) + ')'
+_C_KEYWORDS_RE = re.compile(r'DELINS|DEL|INS|DUP|INV|CON')
+_P_KEYWORDS_RE = re.compile(r'DELINS|DEL|INS|DUP|EXT|FS')
+
+_GENE_RE = re.compile(r'^\s*[A-Z]{2}_\d+(?:\.\d+)?\(([A-Za-z0-9-]+)\)')
+_HGVS_C_RE = re.compile(r'(?<![A-Za-z])c\.\s*([^\s()]+(?:\s*[ACGTacgt]*>\s*[ACGTacgt]+)?)', re.IGNORECASE)
+_HGVS_P_RE = re.compile(r'(?<![A-Za-z])p\.\s*\(?([A-Za-z*]+\d+[^\s)]*)\)?', re.IGNORECASE)
+_BARE_P3_RE = re.compile(rf'(?<![\w.])({_AA3}\d+(?:{_AA3}|\*|=|fs\S*|del\S*|dup|ins\S*)\S*?)(?![\w*])', re.IGNORECASE)
+_BARE_P1_RE = re.compile(rf'(?<![\w.])([{_ONE_LETTER}]\d+(?:[{_ONE_LETTER}X*=]|fs\S*))(?![\w*])', re.IGNORECASE)
+
+
+class ParsedVariant(NamedTuple):
+    """Canonical parts of a variant notation (None where absent)."""
+    gene: Optional[str]
+    c: Optional[str]
+    p: Optional[str]
+
+
+def normalize_gene(gene: Optional[str]) -> str:
+    """Upper-cased gene symbol without surrounding whitespace."""
+    return (gene or '').strip().upper()
+
+
+def normalize_c(change: str) -> str:
+    """Canonical c. change: 'c.536 g>a' -> 'c.536G>A'."""
+    body = re.sub(r'\s+', '', change)
+    if body.lower().startswith('c.'):
+        body = body[2:]
+    body = _C_KEYWORDS_RE.sub(lambda m: m.group(0).lower(), body.upper())
+    return 'c.' + body
+
+
+def normalize_p(change: str) -> str:
+    """Canonical p. change: 'p.(Arg179His)', 'Arg179His', 'R179H' -> 'p.R179H'."""
+    body = re.sub(r'\s+', '', change)
+    if body.lower().startswith('p.'):
+        body = body[2:]
+    body = body.strip('()')
+    body = _THREE_LETTER_RE.sub(lambda m: AMINO_ACIDS[m.group(0).capitalize()], body)
+    body = body.upper().replace('X', '*')
+    body = _P_KEYWORDS_RE.sub(lambda m: m.group(0).lower(), body)
+    return 'p.' + body
+
+
+def parse_variant(text: str, gene: Optional[str] = None) -> ParsedVariant:
+    """
+    Extract the gene and canonical c./p. changes from a variant notation.
+
+    Args:
+        text: Free text, an HGVS change or a ClinVar title.
+        gene: Gene symbol, if known; otherwise taken from a title's
+            "NM_...(GENE):" prefix.
+    """
+    text = text or ''
+    if not gene:
+        match = _GENE_RE.match(text)
+        gene = match.group(1) if match else None
+    c_match = _HGVS_C_RE.search(text)
+    p_match = _HGVS_P_RE.search(text) or _BARE_P3_RE.search(text) or _BARE_P1_RE.search(text)
+    return ParsedVariant(
+        normalize_gene(gene) or None,
+        normalize_c(c_match.group(1)) if c_match else None,
+        normalize_p(p_match.group(1)) if p_match else None,
+    )
+
+
+def three_letter_p(change: str) -> str:
+    """Canonical p. change in ClinVar's three-letter form: 'p.R179H' -> 'p.Arg179His'."""
+    body = change[2:] if change.startswith('p.') else change
+    return 'p.' + re.sub(r'[A-Z*]', lambda m: _THREE_LETTER[m.group(0)], body)
+
+
+def clinvar_term(gene: Optional[str], variant: str) -> str:
+    """
+    ClinVar esearch term for a gene + variant, built from its canonical parts.
+
+    Every spelling with the same key (variant_key) gets the same term: the
+    c. change if there is one, else the p. change in three-letter form, else
+    the text itself, restricted to the gene when it is known.
+    """
+    parsed = parse_variant(variant, gene)
+    if parsed.c:
+        change = f'"{parsed.c}"'
+    elif parsed.p:
+        change = f'"{three_letter_p(parsed.p)}"'
+    else:
+        change = re.sub(r'\s+', ' ', variant or '').strip()
+    return f"{parsed.gene}[gene] AND {change}" if parsed.gene else change
+
+
+def variant_key(gene: Optional[str], variant: str) -> str:
+    """
+    Canonical key of a gene + variant: its c. change if it has one, else its
+    p. change, e.g. 'ACTA2:c.536G>A' or 'ACTA2:p.R179H'.
+
+    Notations with no recognizable c. or p. change key on their text with
+    case and whitespace normalized.
+    """
+    parsed = parse_variant(variant, gene)
+    change = parsed.c or parsed.p or re.sub(r'\s+', ' ', variant or '').strip().upper()
+    return (parsed.gene or '') + ':' + change
@@ -0,0 +1,254 @@
+"""
+On-disk binary format for the vector index.
+
+An index is a directory holding:
+  index.json          Header: format version, embedding model, dimension,
+                      row count, document table and the data files below.
+  vectors-<gen>.npy   (rows, dim) float32 matrix of unit-length vectors,
+                      opened with np.load(mmap_mode='r').
+  meta-<gen>.npy      Structured per-row table (document id, character span,
+                      byte span into the text store).
+  texts-<gen>.bin     UTF-8 text of every document, concatenated.
+  <name>-<gen>.npy/.json
+                      Optional attachments (e.g. the build manifest),
+                      listed under the header's "files" table.
+
+Data files are tagged with a generation id and the header is replaced last
+with os.replace, so readers always see a complete, consistent index and
+worker processes share the mapped pages through the OS cache. open_index
+maps every data file, attachments included, so an index stays readable after
+a newer generation is published and the old files are deleted.
+"""
+import os
+import re
+import json
+import mmap
+import time
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+FORMAT_VERSION = 1
+HEADER_NAME = 'index.json'
+
+META_DTYPE = np.dtype([
+    ('doc', '<i4'),
+    ('start', '<i8'),
+    ('end', '<i8'),
+    ('byte_start', '<i8'),
+    ('byte_end', '<i8'),
+])
+
+# Matches generation-tagged data files, e.g. vectors-18c2f0a1b.npy
+_DATA_FILE_RE = re.compile(r'^[a-z0-9_]+-[0-9a-f]+\.(npy|bin|json)$')
+
+
+class MappedIndex(NamedTuple):
+    """Raw, memory-mapped contents of an index directory."""
+    header: Dict[str, Any]
+    vectors: np.ndarray
+    meta: np.ndarray
+    text_bytes: np.ndarray
+    attachments: Dict[str, Any]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of vectors with each row scaled to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def header_path(index_dir: str) -> str:
+    """Path of the header file for an index directory."""
+    return os.path.join(index_dir, HEADER_NAME)
+
+
+def is_index_dir(path: str) -> bool:
+    """True if path is a directory containing an index header."""
+    return os.path.isdir(path) and os.path.exists(header_path(path))
+
+
+def read_header(index_dir: str) -> Dict[str, Any]:
+    """Read and validate the header of an index directory."""
+    with open(header_path(index_dir), 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    version = header.get('format_version')
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format version {version} in {index_dir}")
+    return header
+
+
+def _char_to_byte_offsets(text: str, positions: Sequence[int]) -> Dict[int, int]:
+    """Map character offsets in text to UTF-8 byte offsets in one pass."""
+    offsets = {}
+    prev_char = 0
+    prev_byte = 0
+    for pos in sorted(set(int(p) for p in positions)):
+        prev_byte += len(text[prev_char:pos].encode('utf-8'))
+        prev_char = pos
+        offsets[pos] = prev_byte
+    return offsets
+
+
+def write_index(
+    index_dir: str,
+    vectors: np.ndarray,
+    doc_ids: Sequence[int],
+    starts: Sequence[int],
+    ends: Sequence[int],
+    documents: List[str],
+    texts: Dict[str, str],
+    model: str,
+    extra: Optional[Dict[str, Any]] = None,
+    attachments: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Write an index directory and atomically publish it.
+
+    Args:
+        index_dir: Output directory (created if missing).
+        vectors: (rows, dim) matrix; stored as float32.
+        doc_ids: Document id of each row (index into documents).
+        starts: Character start offset of each row's chunk.
+        ends: Character end offset of each row's chunk.
+        documents: File name of each document id.
+        texts: Full text of each document, keyed by file name.
+        model: Embedding model name recorded in the header.
+        extra: Additional header fields.
+        attachments: Extra data files keyed by name; NumPy arrays are saved
+            as .npy, anything else as .json.
+    Returns:
+        The header that was written.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2:
+        vectors = vectors.reshape(len(doc_ids), -1)
+    doc_ids = np.asarray(doc_ids, dtype=np.int32)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+
+    generation = f"{time.time_ns():x}"
+    files = {
+        'vectors': f"vectors-{generation}.npy",
+        'meta': f"meta-{generation}.npy",
+        'texts': f"texts-{generation}.bin",
+    }
+
+    # Text store: documents back to back, with per-row byte spans
+    meta = np.zeros(len(doc_ids), dtype=META_DTYPE)
+    meta['doc'] = doc_ids
+    meta['start'] = starts
+    meta['end'] = ends
+    doc_table = []
+    offset = 0
+    with open(os.path.join(index_dir, files['texts']), 'wb') as tf:
+        for doc_id, fname in enumerate(documents):
+            text = texts.get(fname, '')
+            rows = np.nonzero(doc_ids == doc_id)[0]
+            byte_map = _char_to_byte_offsets(
+                text, list(starts[rows]) + list(ends[rows]) + [len(text)]
+            )
+            for row in rows:
+                meta['byte_start'][row] = offset + byte_map[int(starts[row])]
+                meta['byte_end'][row] = offset + byte_map[int(ends[row])]
+            data = text.encode('utf-8')
+            tf.write(data)
+            doc_table.append({
+                'file': fname,
+                'byte_start': offset,
+                'byte_end': offset + len(data),
+                'chars': len(text),
+            })
+            offset += len(data)
+
+    np.save(os.path.join(index_dir, files['vectors']), vectors)
+    np.save(os.path.join(index_dir, files['meta']), meta)
+    for name, value in (attachments or {}).items():
+        if isinstance(value, np.ndarray):
+            files[name] = f"{name}-{generation}.npy"
+            np.save(os.path.join(index_dir, files[name]), value)
+        else:
+            files[name] = f"{name}-{generation}.json"
+            with open(os.path.join(index_dir, files[name]), 'w', encoding='utf-8') as af:
+                json.dump(value, af)
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'model': model,
+        'dim': int(vectors.shape[1]) if len(vectors) else 0,
+        'count': int(len(vectors)),
+        'generation': generation,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'files': files,
+        'documents': doc_table,
+    }
+    if extra:
+        header.update(extra)
+
+    # Publish: the header swap is the commit point
+    tmp_path = header_path(index_dir) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as hf:
+        json.dump(header, hf)
+    os.replace(tmp_path, header_path(index_dir))
+    _remove_stale_files(index_dir, header)
+    return header
+
+
+def _remove_stale_files(index_dir: str, header: Dict[str, Any]):
+    """Delete data files from previous generations."""
+    live = set(header.get('files', {}).values())
+    for name in os.listdir(index_dir):
+        if name in live or not _DATA_FILE_RE.match(name):
+            continue
+        try:
+            os.remove(os.path.join(index_dir, name))
+        except OSError:
+            # Still mapped by a reader on a platform that forbids deletion
+            pass
+
+
+def open_index(index_dir: str) -> MappedIndex:
+    """Open an index directory without reading the vector or text data."""
+    header = read_header(index_dir)
+    files = header['files']
+    vectors = np.load(os.path.join(index_dir, files['vectors']), mmap_mode='r')
+    meta = np.load(os.path.join(index_dir, files['meta']), mmap_mode='r')
+    text_path = os.path.join(index_dir, files['texts'])
+    if os.path.getsize(text_path) > 0:
+        text_bytes = np.memmap(text_path, dtype=np.uint8, mode='r')
+    else:
+        text_bytes = np.zeros(0, dtype=np.uint8)
+    attachments = {
+        name: _map_file(os.path.join(index_dir, fname))
+        for name, fname in files.items() if name not in ('vectors', 'meta', 'texts')
+    }
+    return MappedIndex(header, vectors, meta, text_bytes, attachments)
+
+
+def _map_file(path: str) -> Any:
+    """Memory-map an attachment file (.npy as an array, JSON as raw bytes)."""
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_attachment(attachments: Dict[str, Any], name: str) -> Any:
+    """Value of an attachment mapped by open_index; None if absent."""
+    value = attachments.get(name)
+    if value is None or isinstance(value, np.ndarray):
+        return value
+    return json.loads(value[:])
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a text's UTF-8 bytes."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
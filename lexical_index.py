@@ -0,0 +1,152 @@
+"""
+BM25 lexical index over the same chunks as the vector index.
+
+Clinical queries often hinge on exact tokens (gene symbols such as TGFBR2,
+HGVS strings such as p.Arg179His or c.536G>A, drug names) that dense
+embeddings blur. The tokenizer keeps such compound tokens intact and also
+emits their parts, so "p.Arg179His" matches both "p.arg179his" and
+"arg179his".
+
+Postings are stored as flat arrays (CSR layout) next to the vector index:
+  vocab     sorted list of terms
+  offsets   int64, postings of term i are rows[offsets[i]:offsets[i+1]]
+  rows      int32 row (chunk) ids
+  tfs       uint16 term frequencies
+  lengths   int32 token count of each row
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Alphanumeric runs, optionally joined by HGVS/identifier punctuation
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.:>_+\-*][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+ATTACHMENTS = ('bm25_vocab', 'bm25_offsets', 'bm25_rows', 'bm25_tfs', 'bm25_lengths')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text into terms, keeping compound identifiers and their parts."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_RE.findall(token))
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 scorer over CSR postings arrays."""
+
+    def __init__(self, vocab: List[str], offsets, rows, tfs, lengths,
+                 k1: float = 1.2, b: float = 0.75):
+        self.vocab = list(vocab)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.tfs = np.asarray(tfs, dtype=np.uint16)
+        self.lengths = np.asarray(lengths, dtype=np.int32)
+        self.k1 = k1
+        self.b = b
+        self._term_ids = {term: i for i, term in enumerate(self.vocab)}
+        self.n_rows = int(len(self.lengths))
+        self.avg_length = float(self.lengths.mean()) if self.n_rows else 0.0
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> 'LexicalIndex':
+        """Build postings from chunk texts (one per vector-index row)."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+        vocab = sorted(postings)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, term in enumerate(vocab):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        rows = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(vocab):
+            entries = postings[term]
+            rows[offsets[i]:offsets[i + 1]] = [r for r, _ in entries]
+            tfs[offsets[i]:offsets[i + 1]] = [min(tf, 65535) for _, tf in entries]
+        return cls(vocab, offsets, rows, tfs, np.asarray(lengths, dtype=np.int32))
+
+    def to_attachments(self) -> dict:
+        """Index-directory attachments for this lexical index."""
+        return {
+            'bm25_vocab': self.vocab,
+            'bm25_offsets': self.offsets,
+            'bm25_rows': self.rows,
+            'bm25_tfs': self.tfs,
+            'bm25_lengths': self.lengths,
+        }
+
+    @classmethod
+    def from_attachments(cls, data: dict) -> Optional['LexicalIndex']:
+        """Rebuild from attachments; None if any part is missing."""
+        if any(data.get(name) is None for name in ATTACHMENTS):
+            return None
+        return cls(*(data[name] for name in ATTACHMENTS))
+
+    def idf(self, query: str) -> Dict[str, float]:
+        """BM25 IDF of each query term that occurs in the index."""
+        weights = {}
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is not None:
+                df = self.offsets[term_id + 1] - self.offsets[term_id]
+                weights[term] = float(np.log(1 + (self.n_rows - df + 0.5) / (df + 0.5)))
+        return weights
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for the query."""
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        if not self.n_rows:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / max(self.avg_length, 1e-9))
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = self.rows[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+            df = hi - lo
+            idf = np.log(1 + (self.n_rows - df + 0.5) / (df + 0.5))
+            # Rows are unique within a term's postings, so fancy-index add is safe
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm[rows])
+        return scores
+
+    def top_k(self, query: str, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (rows, scores) of the top_k rows with a positive BM25 score.
+        """
+        scores = self.scores(query)
+        candidates = np.nonzero(scores > 0)[0]
+        if not len(candidates) or top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        k = min(top_k, len(candidates))
+        cand_scores = scores[candidates]
+        if k < len(candidates):
+            part = np.argpartition(-cand_scores, k - 1)[:k]
+        else:
+            part = np.arange(len(candidates))
+        part = part[np.argsort(-cand_scores[part], kind='stable')]
+        return candidates[part], cand_scores[part]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse several ranked row lists: score(row) = sum(1 / (k + rank)).
+
+    Returns:
+        (row, fused score) pairs, best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
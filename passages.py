@@ -0,0 +1,136 @@
+"""
+Query-aware passage extraction from indexed chunks.
+
+Every chunk's sentence boundaries are computed once at build time and stored
+with the index, so at query time a hit's snippet can be the window of
+consecutive sentences that covers the most (IDF-weighted) query terms,
+instead of the chunk's leading characters.
+
+Stored as index attachments (CSR layout over rows):
+  sentence_offsets  int64, sentence ends of row i are ends[offsets[i]:offsets[i+1]]
+  sentence_ends     int32 sentence end offsets relative to the chunk start
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+ATTACHMENTS = ('sentence_offsets', 'sentence_ends')
+
+# Sentence terminator followed by whitespace, or a blank line
+_BOUNDARY_RE = re.compile(r'(?<=[.!?;])\s+(?=["(\[]?[A-Z0-9])|\n\s*\n')
+# Longer "sentences" (tables, reference lists) are cut at whitespace
+MAX_SENTENCE_CHARS = 400
+
+
+def sentence_ends(text: str, max_chars: int = MAX_SENTENCE_CHARS) -> List[int]:
+    """End offsets of the sentences of text; the last one is len(text)."""
+    ends = []
+    start = 0
+    bounds = [m.end() for m in _BOUNDARY_RE.finditer(text)] + [len(text)]
+    for end in bounds:
+        while end - start > max_chars:
+            cut = text.rfind(' ', start + 1, start + max_chars)
+            cut = cut + 1 if cut > start else start + max_chars
+            ends.append(cut)
+            start = cut
+        if end > start:
+            ends.append(end)
+            start = end
+    return ends
+
+
+class SentenceTable:
+    """Per-row sentence boundaries in CSR layout."""
+
+    def __init__(self, offsets, ends):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int32)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> 'SentenceTable':
+        """Split chunk texts (one per vector-index row) into sentences."""
+        offsets = [0]
+        ends: List[int] = []
+        for text in texts:
+            ends.extend(sentence_ends(text))
+            offsets.append(len(ends))
+        return cls(offsets, ends)
+
+    def to_attachments(self) -> dict:
+        return {'sentence_offsets': self.offsets, 'sentence_ends': self.ends}
+
+    @classmethod
+    def from_attachments(cls, data: dict) -> Optional['SentenceTable']:
+        """Rebuild from attachments; None if the index predates them."""
+        if any(data.get(name) is None for name in ATTACHMENTS):
+            return None
+        return cls(*(data[name] for name in ATTACHMENTS))
+
+    def row_ends(self, row: int) -> np.ndarray:
+        return np.asarray(self.ends[self.offsets[row]:self.offsets[row + 1]])
+
+
+def best_passage(text: str, ends: np.ndarray, weights: Dict[str, float],
+                 max_chars: int) -> Tuple[int, int]:
+    """
+    Find the window of consecutive sentences that best matches the query.
+
+    Args:
+        text: Chunk text.
+        ends: Sentence end offsets within text.
+        weights: Query term -> weight (e.g. BM25 IDF).
+        max_chars: Maximum window length in characters.
+    Returns:
+        (start, end) offsets within text. Falls back to the leading
+        max_chars characters if no query term occurs in the text.
+    """
+    if not weights or not len(ends):
+        return 0, min(len(text), max_chars)
+    pattern = re.compile(
+        r'(?<![a-z0-9])(' + '|'.join(re.escape(t) for t in sorted(weights, key=len, reverse=True))
+        + r')(?![a-z0-9])',
+        re.IGNORECASE
+    )
+    # Query terms found in each sentence, and where the first match is
+    found: Dict[int, set] = {}
+    first_match: Dict[int, int] = {}
+    for m in pattern.finditer(text):
+        sentence = int(np.searchsorted(ends, m.start(), side='right'))
+        found.setdefault(sentence, set()).add(m.group(1).lower())
+        first_match.setdefault(sentence, m.start())
+    if not found:
+        return 0, min(len(text), max_chars)
+
+    starts = np.concatenate([[0], ends[:-1]])
+    # Only sentences with a match can bound the best window
+    matched = sorted(found)
+    best = (0.0, matched[0], matched[0])
+    counts: Dict[str, int] = {}
+    score = 0.0
+    left = 0
+    # Two-pointer sweep: score = summed weight of distinct terms in the window
+    for right, sentence in enumerate(matched):
+        for term in found[sentence]:
+            counts[term] = counts.get(term, 0) + 1
+            if counts[term] == 1:
+                score += weights.get(term, 0.0)
+        while left < right and ends[sentence] - starts[matched[left]] > max_chars:
+            for term in found[matched[left]]:
+                counts[term] -= 1
+                if counts[term] == 0:
+                    score -= weights.get(term, 0.0)
+            left += 1
+        if score > best[0]:
+            best = (score, matched[left], sentence)
+    _, left, right = best
+    start, end = int(starts[left]), int(ends[right])
+    if end - start > max_chars:
+        # A single over-long sentence: start shortly before its first match
+        match = min(first_match[s] for s in range(left, right + 1) if s in first_match)
+        cut = text.rfind(' ', start, max(start, match - max_chars // 4))
+        start = max(start, cut + 1 if cut >= 0 else start, end - max_chars)
+        start = min(start, match)
+    # Leading whitespace is not worth a character of the budget
+    while start < end and text[start].isspace():
+        start += 1
+    return start, min(end, start + max_chars)
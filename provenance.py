@@ -0,0 +1,80 @@
+"""
+Page provenance for indexed documents.
+
+extract_pdfs.py writes a page-offset map next to every extracted .txt file.
+The index keeps those maps as one flat array so that any character offset in
+a document resolves to its source PDF and page with a binary search.
+
+Stored as index attachments:
+  page_offsets  int64, page starts of document i are
+                page_starts[page_offsets[i]:page_offsets[i+1]]
+  page_starts   int64 character offset at which each page starts
+  page_sources  source PDF name of each document (null if unknown)
+"""
+import os
+import json
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+ATTACHMENTS = ('page_offsets', 'page_starts', 'page_sources')
+
+
+def page_map_path(text_path: str) -> str:
+    """Path of the page-offset map written next to an extracted .txt file."""
+    return os.path.splitext(text_path)[0] + '.pages.json'
+
+
+def read_page_map(text_path: str) -> Optional[dict]:
+    """Load the page-offset map of an extracted text file, if any."""
+    try:
+        with open(page_map_path(text_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class PageMap:
+    """Character offset -> (source PDF, 1-based page) for every document."""
+
+    def __init__(self, offsets, starts, sources: List[Optional[str]]):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.sources = list(sources)
+
+    @classmethod
+    def build(cls, documents: Sequence[Tuple[Optional[str], Sequence[int]]]) -> 'PageMap':
+        """
+        Build from (source PDF, page start offsets) per document id.
+
+        Documents without a page map contribute (None, []).
+        """
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        starts: List[int] = []
+        sources = []
+        for i, (source, page_starts) in enumerate(documents):
+            starts.extend(int(s) for s in page_starts)
+            offsets[i + 1] = len(starts)
+            sources.append(source)
+        return cls(offsets, starts, sources)
+
+    def to_attachments(self) -> dict:
+        return {
+            'page_offsets': self.offsets,
+            'page_starts': self.starts,
+            'page_sources': self.sources,
+        }
+
+    @classmethod
+    def from_attachments(cls, data: dict) -> Optional['PageMap']:
+        """Rebuild from attachments; None if the index has no page maps."""
+        if any(data.get(name) is None for name in ATTACHMENTS):
+            return None
+        return cls(*(data[name] for name in ATTACHMENTS))
+
+    def locate(self, doc_id: int, offset: int) -> Tuple[Optional[str], Optional[int]]:
+        """Return (source PDF, 1-based page) of a character offset in a document."""
+        lo, hi = self.offsets[doc_id], self.offsets[doc_id + 1]
+        if lo == hi:
+            return self.sources[doc_id], None
+        page = int(np.searchsorted(self.starts[lo:hi], offset, side='right'))
+        return self.sources[doc_id], max(page, 1)
@@ -0,0 +1,170 @@
+"""
+Compact scan vectors for the index: float16 / int8 scalar quantization and
+Matryoshka-style dimension truncation.
+
+text-embedding-3 vectors can be shortened by keeping their leading
+dimensions and re-normalizing. A quantized copy of the (optionally
+truncated) vectors is scanned for every query; the top candidates are then
+re-ranked exactly against the full float32 vectors, which stay memory-mapped
+on disk and are only paged in for those candidates.
+
+Stored as index attachments:
+  quant_codes    (rows, dims) float16 or int8 codes
+  quant_scales   (rows,) float32 per-row scale (int8 only)
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ann_index import sample_queries
+from index_format import normalize_rows
+
+DTYPES = ('float32', 'float16', 'int8')
+ATTACHMENTS = ('quant_codes', 'quant_scales')
+
+# Candidates re-ranked at full precision: max(RERANK_FACTOR * k, RERANK_MIN)
+RERANK_FACTOR = 4
+RERANK_MIN = 32
+# Rows converted to float32 at a time while scanning
+SCAN_BLOCK = 65536
+
+
+def truncate(vectors: np.ndarray, dims: Optional[int]) -> np.ndarray:
+    """Keep the leading dims of each row and re-normalize to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dims is None or dims >= vectors.shape[1]:
+        return normalize_rows(vectors)
+    return normalize_rows(vectors[:, :dims])
+
+
+class QuantizedVectors:
+    """Quantized, optionally truncated copy of an index's vectors."""
+
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+
+    @property
+    def dims(self) -> int:
+        return int(self.codes.shape[1])
+
+    @property
+    def dtype(self) -> str:
+        return str(self.codes.dtype)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.dims * self.codes.dtype.itemsize + (4 if self.scales is not None else 0)
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray, dtype: str = 'float16',
+               dims: Optional[int] = None) -> 'QuantizedVectors':
+        """Quantize unit-length vectors to dtype after truncating to dims."""
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown quantization dtype {dtype!r}; expected one of {DTYPES}")
+        reduced = np.concatenate([
+            truncate(vectors[start:start + SCAN_BLOCK], dims)
+            for start in range(0, len(vectors), SCAN_BLOCK)
+        ]) if len(vectors) else np.zeros((0, dims or 0), dtype=np.float32)
+        if dtype == 'int8':
+            scales = np.abs(reduced).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.round(reduced / scales[:, np.newaxis]).astype(np.int8)
+            return cls(codes, scales.astype(np.float32))
+        return cls(reduced.astype(dtype))
+
+    def to_attachments(self) -> dict:
+        attachments = {'quant_codes': np.ascontiguousarray(self.codes)}
+        if self.scales is not None:
+            attachments['quant_scales'] = self.scales
+        return attachments
+
+    @classmethod
+    def from_attachments(cls, data: dict) -> Optional['QuantizedVectors']:
+        """Rebuild from attachments; None if the index has no quantized copy."""
+        if data.get('quant_codes') is None:
+            return None
+        return cls(data['quant_codes'], data.get('quant_scales'))
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate (n_queries, rows) similarity scores for full-length queries."""
+        q = truncate(queries, self.dims)
+        out = np.empty((len(q), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), SCAN_BLOCK):
+            block = np.asarray(self.codes[start:start + SCAN_BLOCK], dtype=np.float32)
+            block_scores = q @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + SCAN_BLOCK]
+            out[:, start:start + SCAN_BLOCK] = block_scores
+        return out
+
+    def search(self, vectors: np.ndarray, queries: np.ndarray, top_k: int,
+               rerank: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scan the quantized codes, then re-rank the best candidates exactly.
+
+        Args:
+            vectors: Full-precision unit-length vectors (may be memory-mapped).
+            queries: (n_queries, full_dim) unit-length queries.
+            top_k: Rows to return per query.
+            rerank: Candidates re-scored at float32 precision per query.
+        Returns:
+            (rows, scores), each (n_queries, top_k), best first, with exact
+            float32 scores.
+        """
+        n = len(self.codes)
+        k = min(top_k, n)
+        rerank = min(n, max(rerank or RERANK_FACTOR * k, k, RERANK_MIN))
+        approx = self.scores(queries)
+        if rerank < n:
+            candidates = np.argpartition(-approx, rerank - 1, axis=1)[:, :rerank]
+        else:
+            candidates = np.tile(np.arange(n), (len(queries), 1))
+        out_rows = np.empty((len(queries), k), dtype=np.int64)
+        out_scores = np.empty((len(queries), k), dtype=np.float32)
+        for qi, (query, cand) in enumerate(zip(queries, candidates)):
+            cand = np.sort(cand)
+            exact = np.asarray(vectors[cand], dtype=np.float32) @ query
+            order = np.argsort(-exact, kind='stable')[:k]
+            out_rows[qi] = cand[order]
+            out_scores[qi] = exact[order]
+        return out_rows, out_scores
+
+
+def quantization_report(index, settings: Sequence[Tuple[str, Optional[int]]],
+                        n_queries: int = 200, top_k: int = 10,
+                        seed: int = 0) -> List[Dict[str, float]]:
+    """
+    Measure recall@k, memory and latency of quantized search vs exact float32.
+
+    Args:
+        index: A VectorIndex.
+        settings: (dtype, dims) pairs to evaluate; dims None keeps all.
+        n_queries: Number of sampled queries.
+        top_k: k for recall@k.
+        seed: Random seed for query sampling.
+    Returns:
+        One dict per setting (plus a float32 baseline).
+    """
+    queries = sample_queries(index, n_queries, seed)
+    start = time.perf_counter()
+    exact_rows, _ = index.top_k_batch(queries, top_k, exact=True)
+    exact_ms = (time.perf_counter() - start) * 1000 / n_queries
+    report = [{
+        'setting': f"float32/{index.dim}",
+        'bytes_per_vector': index.dim * 4,
+        'recall': 1.0,
+        'ms_per_query': exact_ms,
+    }]
+    for dtype, dims in settings:
+        quantized = QuantizedVectors.encode(index.vectors, dtype, dims)
+        start = time.perf_counter()
+        rows, _ = quantized.search(index.vectors, queries, top_k)
+        elapsed = (time.perf_counter() - start) * 1000 / n_queries
+        hits = sum(len(set(a) & set(e)) for a, e in zip(rows.tolist(), exact_rows.tolist()))
+        report.append({
+            'setting': f"{dtype}/{quantized.dims}",
+            'bytes_per_vector': quantized.bytes_per_vector,
+            'recall': hits / (n_queries * min(top_k, len(index))),
+            'ms_per_query': elapsed,
+        })
+    return report
@@ -6,7 +6,8 @@ import streamlit as st
 from typing import Dict, Any, List
 from openai import OpenAI
 from helper_functions import build_patient_context
-from vector_search import search_documents
+from vector_search import search_documents_batch
+from context_packer import context_budget, pack_context
 from km_curve_generator import KMCurveGenerator
 import json
 from datetime import datetime
@@ -106,6 +107,25 @@ For surgical recommendations, specify:
 Your recommendations should be so specific and detailed that a clinician could immediately implement them without needing further information or clarification."""
 
 
+REPORT_MODEL = "gpt-4.1"
+# Candidates retrieved per query; the context packer trims them to the budget
+REPORT_CANDIDATES = 5
+
+# Targeted retrieval queries, one per report section ({gene} is filled in)
+REPORT_SECTION_QUERIES = [
+    ("Initial Workup", "{gene} heritable thoracic aortic disease initial evaluation diagnostic testing imaging"),
+    ("Risk Stratification", "{gene} aortic dissection risk factors family history aortic event risk"),
+    ("Surgical Thresholds", "{gene} aortic root ascending aorta diameter threshold for prophylactic surgical repair"),
+    ("Imaging Surveillance", "{gene} imaging surveillance interval echocardiography MRI CT aorta"),
+    ("Lifestyle & Activity Guidelines", "{gene} exercise physical activity restrictions isometric competitive sports"),
+    ("Pregnancy/Peripartum", "{gene} pregnancy peripartum aortic dissection risk management delivery"),
+    ("Genetic Counseling", "{gene} genetic testing cascade screening first-degree relatives inheritance"),
+    ("Blood Pressure Recommendations", "blood pressure target hypertension management aortic disease"),
+    ("Medication Management", "{gene} beta-blocker angiotensin receptor blocker losartan medical therapy"),
+    ("Gene/Variant Interpretation", "{gene} variant pathogenicity genotype phenotype correlation"),
+]
+
+
 class ReportGenerator:
     """Generates comprehensive clinical reports for HTAD patients."""
     
@@ -127,27 +147,31 @@ class ReportGenerator:
         # Build patient context
         patient_context = build_patient_context(session_state, clinical_options)
         
-        # Perform vector search for relevant medical literature
+        # Perform vector search for relevant medical literature: the patient
+        # profile plus one targeted query per report section, in one round-trip
+        gene = session_state.get('custom_gene') or session_state.get('gene', '')
+        if gene == 'Other':
+            gene = ''
+        labels = ["Patient Profile"] + [label for label, _ in REPORT_SECTION_QUERIES]
+        queries = [patient_context] + [
+            template.format(gene=gene).strip() for _, template in REPORT_SECTION_QUERIES
+        ]
         with st.spinner("Searching medical literature for report generation..."):
             try:
-                results = search_documents(
-                    query=patient_context,
-                    index_path="data/embeddings.pkl",
-                    top_k=10,  # Get more results for comprehensive report
-                    snippet_length=300
+                results = search_documents_batch(
+                    queries=queries,
+                    top_k=REPORT_CANDIDATES,
+                    snippet_length=400,
+                    mode="hybrid"
                 )
             except Exception as e:
                 st.error(f"Error searching documents: {e}")
                 results = []
         
-        # Build retrieved context
-        context_lines = []
-        for doc in results:
-            context_lines.append(
-                f"Source: {doc.get('file','Unknown')}\n"
-                f"Content: {doc.get('snippet','')}"
-            )
-        retrieved_context = "\n\n".join(context_lines)
+        # Build retrieved context, grouped by section, deduplicated and
+        # packed into the model's token budget
+        packed = pack_context(list(zip(labels, results)), context_budget(REPORT_MODEL))
+        retrieved_context = packed.text
         
         # Build JSON schema for structured output
         report_schema = {
@@ -185,7 +209,7 @@ class ReportGenerator:
                 )
                 
                 response = self.client.responses.create(
-                    model="gpt-4.1",
+                    model=REPORT_MODEL,
                     input=[
                         {"role": "system", "content": REPORT_SYSTEM_PROMPT},
                         {"role": "user", "content": full_context}
@@ -0,0 +1,54 @@
+import gzip
+from clinvar_store import VariantStore, ingest
+
+COLUMNS = ['AlleleID', 'Type', 'Name', 'GeneID', 'GeneSymbol', 'ClinicalSignificance', 'ClinSigSimple',
+           'LastEvaluated', 'ReviewStatus', 'Assembly', 'VariationID']
+
+VARIANTS = [
+    ('NM_001613.4(ACTA2):c.536G>A (p.Arg179His)', 'ACTA2', 'Pathogenic', '1', 'reviewed by expert panel', '42'),
+    ('NM_000138.5(FBN1):c.3037delG (p.Gly1013fs)', 'FBN1', 'Pathogenic', '1', 'criteria provided', '100'),
+    ('NM_000138.5(FBN1):c.3038_3039del (p.Gly1013fs)', 'FBN1', 'Uncertain significance', '0', 'criteria provided',
+     '101'),
+    ('NM_000138.5(FBN1):c.3040C>T (p.Gln1014Ter)', 'BRCA1', 'Pathogenic', '1', 'criteria provided', '200'),
+]
+
+
+def make_store(tmp_path):
+    source = tmp_path / 'variant_summary.txt.gz'
+    with gzip.open(source, 'wt', encoding='utf-8') as f:
+        f.write('#' + '\t'.join(COLUMNS) + '\n')
+        for name, gene, significance, simple, review, variation_id in VARIANTS:
+            for assembly in ('GRCh37', 'GRCh38'):
+                row = {'AlleleID': variation_id, 'Type': 'single nucleotide variant', 'Name': name, 'GeneID': '1',
+                       'GeneSymbol': gene, 'ClinicalSignificance': significance, 'ClinSigSimple': simple,
+                       'LastEvaluated': 'Jan 01, 2024', 'ReviewStatus': review, 'Assembly': assembly,
+                       'VariationID': variation_id}
+                f.write('\t'.join(row[c] for c in COLUMNS) + '\n')
+    output = tmp_path / 'store.sqlite'
+    ingest(str(source), str(output))
+    return VariantStore(str(output))
+
+
+def test_ingest_keeps_htad_genes_once_per_variation(tmp_path):
+    store = make_store(tmp_path)
+    assert store.covers('FBN1') and store.covers('ACTA2')
+    assert not store.covers('BRCA1')
+    assert store.variant_names('FBN1') == ['NM_000138.5(FBN1):c.3037delG (p.Gly1013fs)']
+    assert store.variant_names('FBN1', pathogenic_only=False) == [
+        'NM_000138.5(FBN1):c.3038_3039del (p.Gly1013fs)',
+        'NM_000138.5(FBN1):c.3037delG (p.Gly1013fs)',
+    ]
+
+
+def test_details_by_title_and_other_spellings(tmp_path):
+    store = make_store(tmp_path)
+    assert store.details('NM_001613.4(ACTA2):c.536G>A (p.Arg179His)')['variant_id'] == '42'
+    assert store.details('c.536 g>a', 'ACTA2')['variant_id'] == '42'
+    assert store.details('r179h', 'acta2')['variant_id'] == '42'
+    assert store.details('R179H') is None
+
+
+def test_details_never_match_a_coding_change_on_its_protein_change(tmp_path):
+    store = make_store(tmp_path)
+    assert store.details('c.3038_3039del', 'FBN1')['variant_id'] == '101'
+    assert store.details('c.3039_3040del (p.Gly1013fs)', 'FBN1') is None
@@ -0,0 +1,41 @@
+from clinvar_cache import ClinVarCache
+from hgvs_normalize import parse_variant, variant_key
+
+
+def test_protein_spellings_share_a_key():
+    for spelling in ('R179H', 'r179h', 'p.Arg179His', 'p.(Arg179His)', 'p.arg179his', 'Arg179His'):
+        assert variant_key('ACTA2', spelling) == 'ACTA2:p.R179H', spelling
+
+
+def test_coding_spellings_share_a_key():
+    for spelling in ('c.536G>A', 'c.536 g>a', 'C.536G>A', 'NM_001613.4(ACTA2):c.536G>A (p.Arg179His)'):
+        assert variant_key('acta2', spelling) == 'ACTA2:c.536G>A', spelling
+
+
+def test_clinvar_title_keys_on_its_coding_change():
+    assert variant_key(None, 'NM_001613.4(ACTA2):c.536G>A (p.Arg179His)') == 'ACTA2:c.536G>A'
+
+
+def test_same_protein_change_from_different_coding_changes_keeps_separate_keys():
+    first = variant_key(None, 'NM_000138.5(FBN1):c.3037delG (p.Gly1013fs)')
+    second = variant_key(None, 'NM_000138.5(FBN1):c.3038_3039del (p.Gly1013fs)')
+    assert first == 'FBN1:c.3037delG'
+    assert second == 'FBN1:c.3038_3039del'
+
+
+def test_cache_does_not_share_results_between_coding_changes(tmp_path):
+    cache = ClinVarCache(str(tmp_path / 'clinvar.sqlite'))
+    first = cache.get_or_fetch('details', variant_key(None, 'NM_000138.5(FBN1):c.3037delG (p.Gly1013fs)'),
+                               lambda: {'variant_id': '1'})
+    second = cache.get_or_fetch('details', variant_key(None, 'NM_000138.5(FBN1):c.3038_3039del (p.Gly1013fs)'),
+                                lambda: {'variant_id': '2'})
+    assert (first['variant_id'], second['variant_id']) == ('1', '2')
+
+
+def test_frameshift_and_stop():
+    assert parse_variant('p.Arg179GlyfsTer12').p == 'p.R179Gfs*12'
+    assert parse_variant('r2180x').p == 'p.R2180*'
+
+
+def test_unparsed_text_keys_on_normalized_text():
+    assert variant_key('fbn1', '  exon 2  deletion ') == 'FBN1:EXON 2 DELETION'
@@ -0,0 +1,115 @@
+"""
+Search index for the sidebar variant picker.
+
+Every ClinVar variant name (e.g. "NM_000138.5(FBN1):c.536G>A (p.Arg179His)")
+is indexed under the keys a user is likely to type: the c. change with and
+without its "c." prefix, the p. change in three-letter and one-letter form
+(p.Arg179His, Arg179His, R179H), the transcript and the gene. Queries are
+ranked exact key match first, then key prefix, then substring anywhere in the
+name (via a trigram index), so each keystroke returns the top matches
+without scanning thousands of names.
+"""
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Set
+import numpy as np
+from hgvs_normalize import normalize_p, parse_variant
+
+NGRAM = 3
+DEFAULT_LIMIT = 50
+
+_NAME_RE = re.compile(r'^(?P<transcript>[^(:\s]+)?(?:\((?P<gene>[^)]+)\))?:?')
+_HGVS_C_RE = re.compile(r'\b[cmng]\.[^\s()]+')
+_HGVS_P_RE = re.compile(r'\(p\.([^)]+)\)')
+
+
+def variant_keys(name: str) -> Set[str]:
+    """Lowercase search keys of a ClinVar variant name."""
+    keys = set()
+    match = _NAME_RE.match(name)
+    if match:
+        for part in ('transcript', 'gene'):
+            if match.group(part):
+                keys.add(match.group(part).lower())
+    for c_change in _HGVS_C_RE.findall(name):
+        keys.add(c_change.lower())
+        keys.add(c_change[2:].lower())
+    for p_change in _HGVS_P_RE.findall(name):
+        # normalize_p gives the one-letter form, e.g. 'p.R179H'
+        short = normalize_p(p_change)[2:]
+        for form in (p_change, short):
+            keys.add(form.lower())
+            keys.add('p.' + form.lower())
+    return keys
+
+
+class VariantIndex:
+    """Exact, prefix and substring lookup over a list of variant names."""
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self._lower = [n.lower() for n in self.names]
+        postings: Dict[str, List[int]] = {}
+        for i, name in enumerate(self.names):
+            for key in variant_keys(name):
+                postings.setdefault(key, []).append(i)
+        self._exact = postings
+        self._sorted_keys = sorted(postings)
+        grams: Dict[str, List[int]] = {}
+        for i, text in enumerate(self._lower):
+            for gram in {text[j:j + NGRAM] for j in range(len(text) - NGRAM + 1)}:
+                grams.setdefault(gram, []).append(i)
+        self._grams = {g: np.asarray(ids, dtype=np.int32) for g, ids in grams.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _prefix(self, query: str) -> Iterable[int]:
+        start = bisect_left(self._sorted_keys, query)
+        for key in self._sorted_keys[start:]:
+            if not key.startswith(query):
+                break
+            yield from self._exact[key]
+
+    def _substring(self, query: str) -> Iterable[int]:
+        if len(query) < NGRAM:
+            return (i for i, text in enumerate(self._lower) if query in text)
+        candidates = None
+        for gram in {query[j:j + NGRAM] for j in range(len(query) - NGRAM + 1)}:
+            ids = self._grams.get(gram)
+            if ids is None:
+                return ()
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        return (i for i in candidates.tolist() if query in self._lower[i])
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[str]:
+        """
+        Return up to limit names matching query, best first.
+
+        Args:
+            query: Free text such as "R179H", "p.Arg179", "c.536" or "536G>A".
+            limit: Maximum number of names to return.
+        Returns:
+            Names whose keys equal the query (in any spelling hgvs_normalize
+            recognizes), then names with a key starting with it, then names
+            containing it; each group in list order.
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.names[:limit]
+        seen: Set[int] = set()
+        results: List[str] = []
+        # Other spellings of the same change, e.g. "p.Arg179His" for "R179H"
+        parsed = parse_variant(query)
+        aliases = {query} | {part.lower() for part in (parsed.c, parsed.p) if part}
+        exact = sorted({i for key in aliases for i in self._exact.get(key, ())})
+        groups = (exact, sorted(self._prefix(query)), self._substring(query))
+        for group in groups:
+            for i in group:
+                if i in seen:
+                    continue
+                seen.add(i)
+                results.append(self.names[i])
+                if len(results) >= limit:
+                    return results
+        return results
@@ -1,46 +1,253 @@
 """
 Simple interface for vector search over precomputed embeddings.
 
-Provides a single function to search a pickle index for a query.
+Provides functions to search an index directory for one or many queries. The
+index is held in a process-wide handle so that every Streamlit session shares one
+in-memory copy, and it is reloaded only when the index file changes on disk.
+
+Search modes:
+  vector   dense embedding similarity
+  lexical  BM25 over the same chunks; no network access
+  hybrid   reciprocal rank fusion of the dense and BM25 rankings
+If the query cannot be embedded (embeddings API slow or down), vector and
+hybrid searches fall back to lexical results.
+
+Each hit's snippet is the passage of the matched chunk that best covers the
+query terms (see passages.py), not the chunk's leading characters.
 """
 import os
-from typing import List, Dict, Any
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from vector_store import load_index, search_index
+import index_format
+from lexical_index import reciprocal_rank_fusion
+from vector_store import load_index, search_index, search_index_batch, search_index_lexical
+
+logger = logging.getLogger(__name__)
 
 # Default index path relative to this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DEFAULT_INDEX = os.path.join(BASE_DIR, 'data', 'embeddings.pkl')
+DEFAULT_INDEX = os.path.join(BASE_DIR, 'data', 'index')
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
+# Query embeddings slower than this fall back to lexical search (one attempt, no retries)
+QUERY_EMBEDDING_TIMEOUT = 10.0
+# Candidates taken from each ranking before fusion in hybrid mode
+HYBRID_CANDIDATES = 50
+
+
+class IndexHandle:
+    """
+    Lazily loaded, process-wide view of an index file.
+
+    The loaded index and the file version it came from are kept together
+    in a single tuple that is replaced wholesale on reload, so a search that
+    already grabbed the index keeps using a complete index while a newer
+    one is being loaded.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        # (index, file version) -- swapped atomically on reload
+        self._state: Optional[Tuple[Any, Tuple[int, int, int]]] = None
+        self.load_count = 0
+        self.last_load_seconds: Optional[float] = None
+        self.total_load_seconds = 0.0
+        self.last_loaded_at: Optional[float] = None
+        self.last_checked_at: Optional[float] = None
+
+    def _file_version(self) -> Tuple[int, int, int]:
+        """Identify the current index file by mtime, size and inode."""
+        path = self.index_path
+        if os.path.isdir(path):
+            # Index directories are republished by replacing their header
+            path = index_format.header_path(path)
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self):
+        """Return the loaded index, (re)loading it if the file changed."""
+        version = self._file_version()
+        self.last_checked_at = time.time()
+        state = self._state
+        if state is not None and state[1] == version:
+            return state[0]
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            state = self._state
+            if state is not None and state[1] == version:
+                return state[0]
+            start = time.perf_counter()
+            index = load_index(self.index_path)
+            elapsed = time.perf_counter() - start
+            self._state = (index, version)
+            self.load_count += 1
+            self.last_load_seconds = elapsed
+            self.total_load_seconds += elapsed
+            self.last_loaded_at = time.time()
+            action = "Loaded" if self.load_count == 1 else "Reloaded"
+            logger.info(f"{action} vector index {self.index_path} in {elapsed * 1000:.1f} ms")
+            return index
+
+    def stats(self) -> Dict[str, Any]:
+        """Return load/reload timings for this handle."""
+        return {
+            'index_path': self.index_path,
+            'loaded': self._state is not None,
+            'load_count': self.load_count,
+            'reload_count': max(self.load_count - 1, 0),
+            'last_load_seconds': self.last_load_seconds,
+            'total_load_seconds': self.total_load_seconds,
+            'last_loaded_at': self.last_loaded_at,
+            'last_checked_at': self.last_checked_at,
+        }
+
+
+_handles: Dict[str, IndexHandle] = {}
+_handles_lock = threading.Lock()
+
+
+def get_index_handle(index_path: str = DEFAULT_INDEX) -> IndexHandle:
+    """Return the shared handle for an index path, creating it on first use."""
+    key = os.path.abspath(index_path)
+    handle = _handles.get(key)
+    if handle is None:
+        with _handles_lock:
+            handle = _handles.get(key)
+            if handle is None:
+                handle = IndexHandle(key)
+                _handles[key] = handle
+    return handle
+
+
+def get_index_stats() -> List[Dict[str, Any]]:
+    """Return load/reload timings for every index loaded in this process."""
+    return [handle.stats() for handle in list(_handles.values())]
+
 
 def search_documents(
     query: str,
     index_path: str = DEFAULT_INDEX,
     top_k: int = 5,
-    snippet_length: int = 200
+    snippet_length: int = 200,
+    mode: str = 'vector'
 ) -> List[Dict[str, Any]]:
     """
     Search the vector index for a given query string.
 
     Args:
         query: Query text to search.
-        index_path: Path to the pickle index file.
+        index_path: Path to the index directory (or a legacy pickle file).
         top_k: Number of top results to return.
-        snippet_length: Number of characters to include in snippet.
+        snippet_length: Maximum number of characters in the snippet.
+        mode: One of 'vector', 'lexical' or 'hybrid'.
     Returns:
-        List of dicts with keys: 'file', 'score', 'snippet'.
+        List of dicts with keys: 'file', 'score', 'snippet', 'start', 'end',
+        'section', 'snippet_start', 'snippet_end', 'source', 'page'. Each hit
+        is a chunk; 'start'/'end' are its character offsets in the file,
+        'section' its heading path, and the snippet is its passage best
+        matching the query, at 'snippet_start'/'snippet_end'. 'source' and
+        'page' give the PDF and 1-based page the snippet starts on. Fields
+        the index has no data for are None.
     """
-    # Load index
-    records = load_index(index_path)
+    _check_mode(mode)
+    # Shared index, loaded once per process and refreshed when the file changes
+    index = get_index_handle(index_path).get()
     # Perform search
-    results = []
-    sims = search_index(query, records, top_k)
-    for score, rec in sims:
-        text = rec.get('text', '')
-        # Create a short snippet
-        snippet = text.replace('\n', ' ')[:snippet_length]
-        results.append({
-            'file': rec.get('file'),
-            'score': score,
-            'snippet': snippet
-        })
-    return results
\ No newline at end of file
+    dense = None
+    if mode != 'lexical':
+        n_dense = top_k if mode == 'vector' else max(top_k, HYBRID_CANDIDATES)
+        try:
+            dense = search_index(query, index, n_dense, timeout=QUERY_EMBEDDING_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Query embedding failed, using lexical search: {e}")
+    sims = _combine(query, index, dense, mode, top_k)
+    return [_format_hit(score, rec, index, query, snippet_length) for score, rec in sims]
+
+
+def search_documents_batch(
+    queries: List[str],
+    index_path: str = DEFAULT_INDEX,
+    top_k: int = 5,
+    snippet_length: int = 200,
+    mode: str = 'vector'
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search the vector index for several queries in one round-trip.
+
+    All queries are embedded in a single API request and scored against the
+    index with one matrix-matrix product.
+
+    Args:
+        queries: Query texts to search.
+        index_path: Path to the index directory (or a legacy pickle file).
+        top_k: Number of top results to return per query.
+        snippet_length: Maximum number of characters in each snippet.
+        mode: One of 'vector', 'lexical' or 'hybrid'.
+    Returns:
+        One result list per query, in query order, with the same dicts as
+        search_documents.
+    """
+    _check_mode(mode)
+    index = get_index_handle(index_path).get()
+    if mode == 'lexical':
+        dense_results = [None] * len(queries)
+    else:
+        n_dense = top_k if mode == 'vector' else max(top_k, HYBRID_CANDIDATES)
+        dense_results = search_index_batch(queries, index, n_dense, timeout=QUERY_EMBEDDING_TIMEOUT)
+        if any(d is None for d in dense_results):
+            logger.warning("Some query embeddings failed, using lexical search for them")
+    return [
+        [_format_hit(score, rec, index, query, snippet_length)
+         for score, rec in _combine(query, index, dense, mode, top_k)]
+        for query, dense in zip(queries, dense_results)
+    ]
+
+
+def _check_mode(mode: str):
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+
+
+def _combine(query: str, index, dense, mode: str, top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Produce final (score, record) matches for a query from its dense results.
+
+    dense is None when the query was not (or could not be) embedded, in which
+    case BM25 results are returned.
+    """
+    if dense is None:
+        return search_index_lexical(query, index, top_k)
+    if mode == 'vector':
+        return dense[:top_k]
+    lexical = search_index_lexical(query, index, max(top_k, HYBRID_CANDIDATES))
+    records = {rec['row']: rec for _, rec in dense + lexical}
+    fused = reciprocal_rank_fusion([
+        [rec['row'] for _, rec in dense],
+        [rec['row'] for _, rec in lexical],
+    ])
+    return [(score, records[row]) for row, score in fused[:top_k]]
+
+
+def _format_hit(score: float, rec: Dict[str, Any], index, query: str,
+                snippet_length: int) -> Dict[str, Any]:
+    """Turn a (score, record) match into a search result dict."""
+    # Snippet: the passage of the matched chunk that best covers the query
+    snippet_start, snippet_end, passage = index.passage(rec['row'], query, snippet_length)
+    source, page = index.locate(rec['row'], snippet_start)
+    return {
+        'file': rec.get('file'),
+        'score': score,
+        'snippet': passage.replace('\n', ' '),
+        'start': rec.get('start'),
+        'end': rec.get('end'),
+        'section': rec.get('section'),
+        'snippet_start': snippet_start,
+        'snippet_end': snippet_end,
+        'source': source,
+        'page': page,
+    }
@@ -2,63 +2,543 @@
 """
 Build and search a simple vector store using embeddings.
 
+The index is chunk-granular: every chunk of every document is one row of a
+contiguous, L2-normalized float32 matrix, with per-row metadata recording
+the source file, the chunk's character offsets and its section heading path.
+When extract_pdfs.py left a page map next to a text file, the index also keeps
+it so every hit can be traced to its source PDF page (see provenance.py).
+Documents are split on headings and paragraph boundaries under a token budget
+(see chunker.py). Indexes are stored in the
+memory-mapped directory format described in index_format.py; legacy pickle
+indexes can still be loaded and converted.
+
+Builds are incremental: the index keeps a manifest of per-file and per-chunk
+content hashes plus the embedding model, and a rebuild only embeds chunks
+whose text is not already in the index. A BM25 lexical index over the same
+chunks (see lexical_index.py) is stored alongside the vectors, and large
+indexes can optionally carry an IVF approximate-search index (ann_index.py)
+and a float16/int8, dimension-truncated scan copy of the vectors with exact
+float32 re-ranking (quantization.py).
+
 Commands:
-  build --text-dir <dir> --output <pkl>    Build pickle index from .txt files
-  search --index <pkl> --query "text" [--top-k N]  Search index for query
+  build --text-dir <dir> --output <dir> [--full] [--ann ivf --nlist N]
+        [--dtype float16|int8] [--dims N]  Build index directory from .txt files
+  search --index <dir> --query "text" [--top-k N] [--nprobe N]  Search index for query
+  convert --pickle <pkl> --output <dir>    Convert a legacy pickle index
+  eval-ann --index <dir> [--nprobe N ...]  Report IVF recall@k and latency vs exact search
+  eval-quant --index <dir> [--dims N ...]  Report quantized recall@k, memory and latency
 """
 import os
 import argparse
 import pickle
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-from generate_embeddings import generate_embedding, chunk_text
+import index_format
+import ann_index
+import chunker
+import lexical_index
+import passages
+import provenance
+import quantization
+from ann_index import IVFIndex
+from index_format import normalize_rows
+from lexical_index import LexicalIndex
+from passages import SentenceTable
+from provenance import PageMap, read_page_map
+from quantization import QuantizedVectors
+from generate_embeddings import (
+    generate_embedding, generate_embeddings_batch, plan_batches, EMBEDDING_MODEL
+)
+
+
+class VectorIndex:
+    """
+    Chunk-level vector index held as one contiguous float32 matrix.
+
+    Attributes:
+        vectors: (n_chunks, dim) float32 matrix of unit-length rows.
+        doc_ids: (n_chunks,) int32 index into ``documents`` for each row.
+        starts: (n_chunks,) int64 chunk start offsets in the document text.
+        ends: (n_chunks,) int64 chunk end offsets in the document text.
+        documents: Source file name for each document id.
+        texts: Full text of each document, keyed by file name.
+        model: Embedding model the vectors were produced with.
+        sections: Optional heading path of each row's chunk.
+        pages: Optional source PDF page map of every document.
+        ann: Optional IVF index used for approximate search.
+        quantized: Optional compact scan copy of the vectors; when present,
+            queries scan it and re-rank the best candidates against vectors.
+    """
+
+    def __init__(self, vectors, doc_ids, starts, ends, documents: List[str], texts: Dict[str, str],
+                 model: str = EMBEDDING_MODEL, sections: Optional[List[str]] = None):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.documents = list(documents)
+        self.texts = texts
+        self.model = model
+        self.sections = sections
+        self.pages: Optional[PageMap] = None
+        self._lexical: Optional[LexicalIndex] = None
+        self._sentences: Optional[SentenceTable] = None
+        self.ann: Optional[IVFIndex] = None
+        self.quantized: Optional[QuantizedVectors] = None
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0
+
+    @classmethod
+    def from_records(cls, records: list) -> 'VectorIndex':
+        """Build an index from legacy one-vector-per-document records."""
+        documents = [rec['file'] for rec in records]
+        texts = {rec['file']: rec.get('text', '') for rec in records}
+        if records:
+            vectors = normalize_rows(np.stack([rec['vector'] for rec in records]))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        return cls(
+            vectors,
+            np.arange(len(records)),
+            np.zeros(len(records)),
+            [len(texts[f]) for f in documents],
+            documents,
+            texts
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'VectorIndex':
+        """Build an index from a pickled chunk-level dict."""
+        return cls(
+            data['vectors'], data['doc_ids'], data['starts'], data['ends'],
+            data['documents'], data['texts']
+        )
+
+    def document_text(self, fname: str) -> str:
+        """Return the full text of a document."""
+        return self.texts.get(fname, '')
+
+    def chunk_text(self, row: int) -> str:
+        """Return the text of a single row's chunk."""
+        fname = self.documents[self.doc_ids[row]]
+        return self.document_text(fname)[int(self.starts[row]):int(self.ends[row])]
+
+    def lexical(self) -> LexicalIndex:
+        """Return the BM25 index over this index's chunks."""
+        if self._lexical is None:
+            self._lexical = LexicalIndex.build(self.chunk_text(row) for row in range(len(self)))
+        return self._lexical
+
+    def sentences(self) -> SentenceTable:
+        """Return the sentence boundaries of this index's chunks."""
+        if self._sentences is None:
+            self._sentences = SentenceTable.build(self.chunk_text(row) for row in range(len(self)))
+        return self._sentences
+
+    def passage(self, row: int, query: str, max_chars: int) -> Tuple[int, int, str]:
+        """
+        Return the window of a row's chunk that best matches the query.
+
+        Returns:
+            (start, end, text); offsets are characters in the document.
+        """
+        text = self.chunk_text(row)
+        start, end = passages.best_passage(
+            text, self.sentences().row_ends(row), self.lexical().idf(query), max_chars
+        )
+        offset = int(self.starts[row])
+        return offset + start, offset + end, text[start:end]
+
+    def derived_attachments(self) -> dict:
+        """Attachments computed from the chunks themselves (sections, lexical postings, sentences, IVF lists)."""
+        attachments = self.lexical().to_attachments()
+        if self.sections is not None:
+            attachments['sections'] = list(self.sections)
+        attachments.update(self.sentences().to_attachments())
+        if self.ann is not None:
+            attachments.update(self.ann.to_attachments())
+        if self.quantized is not None:
+            attachments.update(self.quantized.to_attachments())
+        if self.pages is not None:
+            attachments.update(self.pages.to_attachments())
+        return attachments
+
+    def locate(self, row: int, offset: int) -> Tuple[Optional[str], Optional[int]]:
+        """Return (source PDF, 1-based page) of a character offset in a row's document."""
+        if self.pages is None:
+            return None, None
+        return self.pages.locate(int(self.doc_ids[row]), offset)
+
+    def record(self, row: int) -> dict:
+        """Return metadata and chunk text for a single row."""
+        source, page = self.locate(row, int(self.starts[row]))
+        return {
+            'row': int(row),
+            'file': self.documents[self.doc_ids[row]],
+            'start': int(self.starts[row]),
+            'end': int(self.ends[row]),
+            'section': self.sections[row] if self.sections is not None else None,
+            'source': source,
+            'page': page,
+            'text': self.chunk_text(row),
+        }
+
+    def save(self, index_dir: str, attachments: Optional[dict] = None) -> dict:
+        """Write the index in the binary directory format."""
+        return index_format.write_index(
+            index_dir, self.vectors, self.doc_ids, self.starts, self.ends,
+            self.documents, self.texts, self.model, attachments=attachments
+        )
+
+    def top_k(self, query_vector, top_k: int = 5, nprobe: Optional[int] = None,
+              exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every row against a query vector with one matrix-vector product.
+
+        Returns:
+            (rows, scores) for the top_k rows, ordered by descending score.
+        """
+        rows, scores = self.top_k_batch(query_vector, top_k, nprobe, exact)
+        return rows[0], scores[0]
+
+    def top_k_batch(self, query_vectors, top_k: int = 5, nprobe: Optional[int] = None,
+                    exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score several queries at once with one matrix-matrix product.
+
+        If the index has an IVF index, only the nprobe closest lists are
+        scanned unless exact=True (or nprobe covers every list). Otherwise,
+        if it has a quantized copy, that is scanned and the best candidates
+        are re-ranked against the float32 vectors.
+
+        Args:
+            query_vectors: (n_queries, dim) matrix, or a single vector.
+            top_k: Number of rows to return per query.
+            nprobe: IVF lists to scan (default ann_index.DEFAULT_NPROBE).
+            exact: Force brute-force search.
+        Returns:
+            (rows, scores), each (n_queries, k), ordered by descending score
+            within each query. Approximate search pads with row -1 when a
+            query has fewer than k candidates.
+        """
+        queries = normalize_rows(query_vectors)
+        n = len(self)
+        k = min(top_k, n)
+        if k <= 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        nprobe = nprobe or ann_index.DEFAULT_NPROBE
+        if not exact and self.ann is not None and nprobe < self.ann.nlist:
+            return self.ann.search(self.vectors, queries, k, nprobe)
+        if not exact and self.quantized is not None:
+            return self.quantized.search(self.vectors, queries, k)
+        scores = queries @ self.vectors.T
+        if k < n:
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            rows = np.tile(np.arange(n), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class MappedVectorIndex(VectorIndex):
+    """
+    VectorIndex backed by a memory-mapped index directory.
+
+    Opening is O(1): vectors, row metadata and texts stay on disk and are
+    paged in by the OS only when a query touches them.
+    """
+
+    def __init__(self, index_dir: str):
+        mapped = index_format.open_index(index_dir)
+        self.index_dir = index_dir
+        self.header = mapped.header
+        self.meta = mapped.meta
+        self.text_bytes = mapped.text_bytes
+        self.attachments = mapped.attachments
+        self._doc_table = {d['file']: d for d in mapped.header['documents']}
+        super().__init__(
+            mapped.vectors,
+            mapped.meta['doc'],
+            mapped.meta['start'],
+            mapped.meta['end'],
+            [d['file'] for d in mapped.header['documents']],
+            {},
+            mapped.header.get('model', EMBEDDING_MODEL),
+            index_format.load_attachment(mapped.attachments, 'sections')
+        )
+        self.ann = IVFIndex.from_attachments({
+            name: index_format.load_attachment(mapped.attachments, name)
+            for name in ann_index.ATTACHMENTS
+        })
+        self.quantized = QuantizedVectors.from_attachments({
+            name: index_format.load_attachment(mapped.attachments, name)
+            for name in quantization.ATTACHMENTS
+        })
+        self.pages = PageMap.from_attachments({
+            name: index_format.load_attachment(mapped.attachments, name)
+            for name in provenance.ATTACHMENTS
+        })
 
-def build_index(text_dir: str, index_path: str):
-    """Build a vector index from text files and save as pickle."""
-    records = []
-    for fname in os.listdir(text_dir):
+    def _decode(self, byte_start: int, byte_end: int) -> str:
+        return bytes(self.text_bytes[byte_start:byte_end]).decode('utf-8')
+
+    def document_text(self, fname: str) -> str:
+        doc = self._doc_table.get(fname)
+        if doc is None:
+            return ''
+        return self._decode(doc['byte_start'], doc['byte_end'])
+
+    def chunk_text(self, row: int) -> str:
+        return self._decode(int(self.meta['byte_start'][row]), int(self.meta['byte_end'][row]))
+
+    def save(self, index_dir: str, attachments: Optional[dict] = None) -> dict:
+        texts = {fname: self.document_text(fname) for fname in self.documents}
+        return index_format.write_index(
+            index_dir, self.vectors, self.doc_ids, self.starts, self.ends,
+            self.documents, texts, self.model, attachments=attachments
+        )
+
+    def manifest(self) -> Optional[dict]:
+        """Return the build manifest stored with the index, if any."""
+        return index_format.load_attachment(self.attachments, 'manifest')
+
+    def lexical(self) -> LexicalIndex:
+        """Return the stored BM25 postings, building them if the index predates them."""
+        if self._lexical is None:
+            stored = LexicalIndex.from_attachments({
+                name: index_format.load_attachment(self.attachments, name)
+                for name in lexical_index.ATTACHMENTS
+            })
+            self._lexical = stored if stored is not None else super().lexical()
+        return self._lexical
+
+    def sentences(self) -> SentenceTable:
+        """Return the stored sentence boundaries, computing them if the index predates them."""
+        if self._sentences is None:
+            stored = SentenceTable.from_attachments({
+                name: index_format.load_attachment(self.attachments, name)
+                for name in passages.ATTACHMENTS
+            })
+            self._sentences = stored if stored is not None else super().sentences()
+        return self._sentences
+
+
+def _reusable_vectors(index_path: str) -> Tuple[Optional['MappedVectorIndex'], Dict[str, int], dict]:
+    """
+    Map chunk hashes of an existing index to their rows.
+
+    Returns:
+        (previous index, {chunk hash: row}, {file: previous file hash}).
+        Nothing is reusable if there is no index, no manifest, or the
+        embedding model changed.
+    """
+    if not index_format.is_index_dir(index_path):
+        return None, {}, {}
+    try:
+        previous = MappedVectorIndex(index_path)
+        manifest = previous.manifest()
+    except Exception as e:
+        print(f"Warning: ignoring unreadable index at {index_path}: {e}")
+        return None, {}, {}
+    if not manifest or manifest.get('model') != EMBEDDING_MODEL:
+        return previous, {}, {}
+    rows_by_hash = {}
+    file_hashes = {}
+    for doc_id, fname in enumerate(previous.documents):
+        entry = manifest['files'].get(fname)
+        if entry is None:
+            continue
+        file_hashes[fname] = entry['sha256']
+        rows = np.nonzero(previous.doc_ids == doc_id)[0]
+        for row, chunk_hash in zip(rows, entry['chunks']):
+            rows_by_hash.setdefault(chunk_hash, int(row))
+    return previous, rows_by_hash, file_hashes
+
+def build_index(text_dir: str, index_path: str, incremental: bool = True,
+                ann: Optional[str] = None, nlist: Optional[int] = None,
+                dtype: str = 'float32', dims: Optional[int] = None):
+    """
+    Build a chunk-level vector index from text files and save it as an index directory.
+
+    With incremental=True, chunks whose content hash is already present in
+    the existing index at index_path reuse their stored vectors; only new or
+    changed chunks are sent to the embeddings API.
+
+    With ann='ivf', an IVF index with nlist lists is trained and stored,
+    unless the index is smaller than ann_index.MIN_ROWS_FOR_ANN rows.
+
+    With dtype 'float16'/'int8' and/or dims, a quantized, truncated scan copy
+    is stored; the float32 vectors are kept for exact re-ranking.
+    """
+    if ann is not None and ann not in ann_index.ANN_TYPES:
+        raise ValueError(f"Unknown ANN index type {ann!r}; expected one of {ann_index.ANN_TYPES}")
+    previous, rows_by_hash, old_file_hashes = (None, {}, {})
+    if incremental:
+        previous, rows_by_hash, old_file_hashes = _reusable_vectors(index_path)
+
+    corpus = []
+    pending = {}
+    for fname in sorted(os.listdir(text_dir)):
         if not fname.lower().endswith('.txt'):
             continue
         path = os.path.join(text_dir, fname)
         with open(path, 'r', encoding='utf-8') as f:
             text = f.read()
-        # Chunk text and embed
-        parts = chunk_text(text)
-        vecs = []
-        for part in parts:
-            try:
-                vecs.append(generate_embedding(part))
-            except Exception as e:
-                print(f"Warning: failed to embed chunk of {fname}: {e}")
-        if not vecs:
+        file_hash = index_format.content_hash(text)
+        # Page map from extract_pdfs.py, unless the text was edited since
+        page_map = read_page_map(path)
+        if page_map and page_map.get('chars') == len(text):
+            pages = (page_map.get('source'), page_map['page_starts'])
+        else:
+            pages = (None, [])
+        status = old_file_hashes.get(fname)
+        if status is None:
+            print(f"New: {fname}")
+        elif status != file_hash:
+            print(f"Changed: {fname}")
+        chunks = []
+        for chunk in chunker.iter_chunks(text.splitlines(keepends=True), fname):
+            chunk_text = text[chunk.start:chunk.end]
+            if not chunk_text.strip():
+                continue
+            chunk_hash = index_format.content_hash(chunk_text)
+            chunks.append((chunk.start, chunk.end, chunk.section, chunk_hash))
+            if chunk_hash not in rows_by_hash:
+                pending.setdefault(chunk_hash, chunk_text)
+        corpus.append((fname, text, file_hash, chunks, pages))
+    for fname in sorted(set(old_file_hashes) - {c[0] for c in corpus}):
+        print(f"Removed: {fname}")
+
+    # Embed only unseen chunks, in batched requests
+    new_vectors = {}
+    if pending:
+        texts_to_embed = list(pending.values())
+        print(f"Embedding {len(texts_to_embed)} new chunks in "
+              f"{len(plan_batches(texts_to_embed))} batched requests")
+        for chunk_hash, vec in zip(pending, generate_embeddings_batch(texts_to_embed)):
+            if vec is not None:
+                new_vectors[chunk_hash] = normalize_rows(vec)[0]
+
+    documents = []
+    texts = {}
+    manifest = {'model': EMBEDDING_MODEL, 'files': {}}
+    vectors, doc_ids, starts, ends, sections = [], [], [], [], []
+    page_maps = []
+    reused = 0
+    for fname, text, file_hash, chunks, pages in corpus:
+        doc_id = len(documents)
+        chunk_hashes = []
+        for start, end, section, chunk_hash in chunks:
+            if chunk_hash in new_vectors:
+                vec = new_vectors[chunk_hash]
+            elif chunk_hash in rows_by_hash:
+                vec = previous.vectors[rows_by_hash[chunk_hash]]
+                reused += 1
+            else:
+                print(f"Warning: failed to embed chunk of {fname} [{start}:{end}]")
+                continue
+            vectors.append(vec)
+            doc_ids.append(doc_id)
+            starts.append(start)
+            ends.append(end)
+            sections.append(section)
+            chunk_hashes.append(chunk_hash)
+        if not chunk_hashes:
             print(f"Skipping {fname}, no embeddings generated.")
             continue
-        # Average vectors for document
-        doc_vec = np.mean(vecs, axis=0)
-        records.append({'file': fname, 'text': text, 'vector': doc_vec})
-        print(f"Indexed {fname}")
-    # Save to pickle
-    with open(index_path, 'wb') as pf:
-        pickle.dump(records, pf)
-    print(f"Saved index with {len(records)} documents to {index_path}")
-
-def load_index(index_path: str):
-    """Load vector index from pickle file."""
+        documents.append(fname)
+        page_maps.append(pages)
+        texts[fname] = text
+        manifest['files'][fname] = {'sha256': file_hash, 'chunks': chunk_hashes}
+        print(f"Indexed {fname} ({len(chunk_hashes)} chunks)")
+    matrix = np.stack(vectors).astype(np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+    index = VectorIndex(matrix, doc_ids, starts, ends, documents, texts, sections=sections)
+    if any(source is not None for source, _ in page_maps):
+        index.pages = PageMap.build(page_maps)
+    if ann == 'ivf':
+        if len(index) >= ann_index.MIN_ROWS_FOR_ANN:
+            index.ann = IVFIndex.train(index.vectors, nlist)
+            print(f"Trained IVF index with {index.ann.nlist} lists")
+        else:
+            print(f"Index has {len(index)} rows; skipping IVF, exact search will be used")
+    if dtype != 'float32' or dims:
+        index.quantized = QuantizedVectors.encode(index.vectors, dtype, dims)
+        print(f"Stored {index.quantized.dtype} scan vectors with {index.quantized.dims} dims "
+              f"({index.quantized.bytes_per_vector} bytes/vector)")
+    # The header is published last, so readers never see a partial index
+    attachments = {'manifest': manifest}
+    attachments.update(index.derived_attachments())
+    index.save(index_path, attachments=attachments)
+    print(f"Saved index with {len(index)} chunks from {len(documents)} documents to {index_path} "
+          f"({reused} reused, {len(new_vectors)} newly embedded)")
+
+def load_pickle_index(index_path: str) -> VectorIndex:
+    """Load a pickle index (chunk-level or legacy document-level)."""
     with open(index_path, 'rb') as pf:
-        return pickle.load(pf)
-
-def search_index(query: str, records: list, top_k: int = 5):
-    """Search the index for the query and return top_k matches."""
-    q_vec = generate_embedding(query)
-    # Compute cosine similarities
-    sims = []
-    q_norm = np.linalg.norm(q_vec)
-    for rec in records:
-        v = rec['vector']
-        sim = float(np.dot(q_vec, v) / (q_norm * np.linalg.norm(v)))
-        sims.append((sim, rec))
-    # Sort by descending similarity
-    sims.sort(key=lambda x: x[0], reverse=True)
-    return sims[:top_k]
+        data = pickle.load(pf)
+    if isinstance(data, dict) and data.get('format') == 'chunks':
+        return VectorIndex.from_dict(data)
+    return VectorIndex.from_records(data)
+
+def load_index(index_path: str) -> VectorIndex:
+    """Open an index directory, or load a legacy pickle index."""
+    if os.path.isdir(index_path):
+        return MappedVectorIndex(index_path)
+    return load_pickle_index(index_path)
+
+def convert_pickle_index(pickle_path: str, index_dir: str) -> dict:
+    """Convert a pickle index into the binary directory format."""
+    index = load_pickle_index(pickle_path)
+    header = index.save(index_dir, attachments=index.derived_attachments())
+    print(f"Converted {pickle_path} ({len(index)} rows, dim {header['dim']}) to {index_dir}")
+    return header
+
+def _records(index: VectorIndex, rows, scores) -> List[Tuple[float, dict]]:
+    """Pair scores with records, skipping approximate-search padding."""
+    return [(float(score), index.record(row)) for row, score in zip(rows, scores) if row >= 0]
+
+def search_index(query: str, index: VectorIndex, top_k: int = 5,
+                 timeout: Optional[float] = None, nprobe: Optional[int] = None) -> List[Tuple[float, dict]]:
+    """Search the index for the query and return top_k (score, record) matches."""
+    q_vec = generate_embedding(query, timeout=timeout)
+    rows, scores = index.top_k(q_vec, top_k, nprobe)
+    return _records(index, rows, scores)
+
+def search_index_batch(queries: List[str], index: VectorIndex, top_k: int = 5,
+                       timeout: Optional[float] = None,
+                       nprobe: Optional[int] = None) -> List[Optional[List[Tuple[float, dict]]]]:
+    """
+    Search the index for several queries, embedding them in one request.
+
+    Returns:
+        One list of top_k (score, record) matches per query, in query order.
+        Queries that could not be embedded get None.
+    """
+    if not queries:
+        return []
+    # With a timeout, one attempt: the caller falls back to lexical search at the deadline
+    q_vecs = generate_embeddings_batch(list(queries), timeout=timeout,
+                                       max_retries=1 if timeout is not None else 3)
+    embedded = [i for i, vec in enumerate(q_vecs) if vec is not None]
+    results: List[Optional[List[Tuple[float, dict]]]] = [None] * len(queries)
+    if not embedded:
+        return results
+    rows, scores = index.top_k_batch(np.stack([q_vecs[i] for i in embedded]), top_k, nprobe)
+    for i, q_rows, q_scores in zip(embedded, rows, scores):
+        results[i] = _records(index, q_rows, q_scores)
+    return results
+
+def search_index_lexical(query: str, index: VectorIndex, top_k: int = 5) -> List[Tuple[float, dict]]:
+    """BM25 search over the index's chunks; needs no network access."""
+    rows, scores = index.lexical().top_k(query, top_k)
+    return _records(index, rows, scores)
 
 def main():
     parser = argparse.ArgumentParser(description="Vector store build/search")
@@ -66,26 +546,70 @@ def main():
 
     build = subparsers.add_parser('build', help='Build index from txt files')
     build.add_argument('--text-dir', default='data/text', help='Directory with .txt files')
-    build.add_argument('--output', default='data/embeddings.pkl', help='Output pickle file')
+    build.add_argument('--output', default='data/index', help='Output index directory')
+    build.add_argument('--full', action='store_true', help='Re-embed every chunk instead of reusing stored vectors')
+    build.add_argument('--ann', choices=ann_index.ANN_TYPES, help='Also build an approximate-search index')
+    build.add_argument('--nlist', type=int, help='IVF lists (default 4*sqrt(rows))')
+    build.add_argument('--dtype', choices=quantization.DTYPES, default='float32', help='Scan vector precision')
+    build.add_argument('--dims', type=int, help='Truncate scan vectors to this many leading dimensions')
 
     search = subparsers.add_parser('search', help='Search index for a query')
-    search.add_argument('--index', default='data/embeddings.pkl', help='Pickle index file')
+    search.add_argument('--index', default='data/index', help='Index directory or legacy pickle file')
     search.add_argument('--query', required=True, help='Query text')
     search.add_argument('--top-k', type=int, default=5, help='Number of top results to return')
+    search.add_argument('--nprobe', type=int, help='IVF lists to scan (approximate indexes only)')
+
+    convert = subparsers.add_parser('convert', help='Convert a legacy pickle index')
+    convert.add_argument('--pickle', required=True, help='Pickle index file')
+    convert.add_argument('--output', default='data/index', help='Output index directory')
+
+    evaluate = subparsers.add_parser('eval-ann', help='Report IVF recall@k and latency vs exact search')
+    evaluate.add_argument('--index', default='data/index', help='Index directory')
+    evaluate.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help='nprobe settings')
+    evaluate.add_argument('--nlist', type=int, help='Train a temporary IVF index with this many lists')
+    evaluate.add_argument('--queries', type=int, default=200, help='Number of sampled queries')
+    evaluate.add_argument('--top-k', type=int, default=10, help='k for recall@k')
+
+    evaluate_quant = subparsers.add_parser('eval-quant', help='Report quantized recall@k, memory and latency')
+    evaluate_quant.add_argument('--index', default='data/index', help='Index directory')
+    evaluate_quant.add_argument('--dtype', choices=quantization.DTYPES[1:], nargs='+',
+                                default=['float16', 'int8'], help='Quantization types')
+    evaluate_quant.add_argument('--dims', type=int, nargs='+', default=[0, 512, 256],
+                                help='Truncated dimensions (0 keeps all)')
+    evaluate_quant.add_argument('--queries', type=int, default=200, help='Number of sampled queries')
+    evaluate_quant.add_argument('--top-k', type=int, default=10, help='k for recall@k')
 
     args = parser.parse_args()
     if args.command == 'build':
-        build_index(args.text_dir, args.output)
+        build_index(args.text_dir, args.output, incremental=not args.full,
+                    ann=args.ann, nlist=args.nlist, dtype=args.dtype, dims=args.dims)
     elif args.command == 'search':
-        records = load_index(args.index)
-        results = search_index(args.query, records, args.top_k)
+        index = load_index(args.index)
+        results = search_index(args.query, index, args.top_k, nprobe=args.nprobe)
         for score, rec in results:
-            print(f"{rec['file']} (score: {score:.4f})")
-            # Optionally print snippet
-            snippet = rec['text'][:200].replace('\n', ' ')
+            print(f"{rec['file']} [{rec['start']}:{rec['end']}] (score: {score:.4f})")
+            # Print the passage that best matches the query
+            snippet = index.passage(rec['row'], args.query, 200)[2].replace('\n', ' ')
             print(f"  {snippet}...")
         if not results:
             print("No results found.")
+    elif args.command == 'convert':
+        convert_pickle_index(args.pickle, args.output)
+    elif args.command == 'eval-ann':
+        index = load_index(args.index)
+        if args.nlist or index.ann is None:
+            index.ann = IVFIndex.train(index.vectors, args.nlist)
+        print(f"{len(index)} rows, {index.ann.nlist} IVF lists, recall@{args.top_k} "
+              f"over {args.queries} queries")
+        for row in ann_index.recall_report(index, args.nprobe, args.queries, args.top_k):
+            print(f"  {row['setting']:>12}  recall {row['recall']:.3f}  {row['ms_per_query']:.3f} ms/query")
+    elif args.command == 'eval-quant':
+        index = load_index(args.index)
+        settings = [(dtype, dims or None) for dtype in args.dtype for dims in args.dims]
+        print(f"{len(index)} rows, recall@{args.top_k} over {args.queries} queries")
+        for row in quantization.quantization_report(index, settings, args.queries, args.top_k):
+            print(f"  {row['setting']:>14}  {row['bytes_per_vector']:>6} B/vector  "
+                  f"recall {row['recall']:.3f}  {row['ms_per_query']:.3f} ms/query")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()